@@ -0,0 +1,118 @@
+"""
+Client helpers shared by the test scripts
+Request encoding and streamed-answer output for the /ask endpoints
+"""
+
+import sys
+import time
+
+import orjson
+
+# SSE data-line prefix, matched on raw bytes
+DATA_PREFIX = b"data: "
+PREFIX_LEN = len(DATA_PREFIX)
+
+# Streamed answer text reaches the terminal in batches: at a newline or every 50 ms,
+# instead of one write() per token
+STREAM_FLUSH_SECONDS = 0.05
+
+# Request bodies are pre-encoded with orjson (see ask_body); the header is set per call
+# because a session-wide Content-Type would break multipart uploads
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+def ask_body(question, session_id=None):
+    """orjson-encoded /ask request body, sent as data= with JSON_HEADERS"""
+    request_data = {"question": question}
+    if session_id:
+        request_data["session_id"] = session_id
+    return orjson.dumps(request_data)
+
+def preview(text, limit=200):
+    """First `limit` characters of text, with an ellipsis if it was cut"""
+    return f"{text[:limit]}…" if len(text) > limit else text
+
+def iter_sse(response, report_malformed=False):
+    """
+    Yield each SSE event's parsed data, splitting raw 4 KB reads on event boundaries
+    Consume it to the end (the server closes the stream after the done event) so the
+    connection goes back to the session's pool instead of being left half-read;
+    malformed events are skipped, with a warning if report_malformed is set
+    """
+    # Hoisted out of the per-event loop
+    loads = orjson.loads
+    decode_error = orjson.JSONDecodeError
+    prefix, prefix_len = DATA_PREFIX, PREFIX_LEN
+    buffer = bytearray()
+    for data in response.iter_content(chunk_size=4096):
+        buffer += data
+        end = buffer.rfind(b"\n\n")
+        if end == -1:
+            continue
+        # One split per read; only complete events are consumed
+        events = buffer[:end].split(b"\n\n")
+        del buffer[:end + 2]
+        for event in events:
+            # Per the SSE spec an event's data lines join with newlines, and the payload is
+            # parsed once per complete event; comments, other fields and keepalives drop out
+            payload = b"\n".join(
+                line[prefix_len:] for line in event.split(b"\n") if line.startswith(prefix)
+            )
+            if not payload.strip():
+                continue
+            try:
+                yield loads(payload)
+            except decode_error:
+                if report_malformed:
+                    print(f"\n⚠️  Skipping malformed event: {payload[:80].decode(errors='replace')}")
+
+def ask_streaming(http, base_url, question, session_id=None):
+    """
+    Ask via /ask/stream on the requests session http and collect the answer
+    Returns an /ask-shaped dict, or None on error
+    """
+    body = ask_body(question, session_id)
+    
+    with http.post(f"{base_url}/ask/stream", data=body, headers=JSON_HEADERS, stream=True, timeout=120) as response:
+        if response.status_code != 200:
+            print(f"❌ Error: {response.text}")
+            return None
+        
+        answer_parts = []
+        sources = []
+        # Read to the end of the stream so the connection goes back to the pool
+        for data in iter_sse(response):
+            if data.get("error"):
+                print(f"❌ Error: {data['error']}")
+                return None
+            if data.get("sources"):
+                sources = data["sources"]
+            if data.get("answer_chunk"):
+                answer_parts.append(data["answer_chunk"])
+        
+        return {
+            "session_id": response.headers.get("X-Session-ID"),
+            "answer": "".join(answer_parts),
+            "sources": sources
+        }
+
+class StreamPrinter:
+    """Buffers streamed answer text and writes it out at a newline or every STREAM_FLUSH_SECONDS"""
+    
+    def __init__(self):
+        self.parts = []
+        self.last_flush = time.perf_counter()
+    
+    def write(self, text):
+        """Queue text, flushing if it ends a line or the last flush was long enough ago"""
+        self.parts.append(text)
+        now = time.perf_counter()
+        if "\n" in text or now - self.last_flush >= STREAM_FLUSH_SECONDS:
+            self.flush(now)
+    
+    def flush(self, now=None):
+        """Write out everything queued so far"""
+        if self.parts:
+            sys.stdout.write("".join(self.parts))
+            sys.stdout.flush()
+            self.parts.clear()
+        self.last_flush = now or time.perf_counter()
@@ -4,18 +4,28 @@ Provides REST API endpoints for document management and question answering
 Includes: Streaming responses, conversation history, document management
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware  # ← THIS IS THE NEW LINE
-from pydantic import BaseModel
-from typing import Optional, List, Dict
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, List, Dict, Deque, Tuple, AsyncIterator
+from dataclasses import dataclass, field
+from collections import OrderedDict, deque
+from operator import itemgetter
+from functools import partial
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 import os
+import hashlib
 import shutil
 from datetime import datetime
-import json
-import uuid
+import orjson
+import secrets
+import asyncio
+import anyio
+import aiofiles
 
-from rag_engine import LocalRAGSystem
+from rag_engine import LocalRAGSystem, ollama_session, PROMPT_HISTORY_TURNS
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -23,7 +33,8 @@ app = FastAPI(
     description="🚀 Retrieval-Augmented Generation API using Ollama (100% Local & Free!)",
     version="1.0.0",
     docs_url="/docs",  # Swagger UI at /docs
-    redoc_url="/redoc"  # ReDoc at /redoc
+    redoc_url="/redoc",  # ReDoc at /redoc
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -34,32 +45,219 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Dedicated pool for blocking RAG work (Ollama + FAISS) so long LLM calls
+# can't starve the default threadpool used for uploads and file I/O
+rag_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag")
+
 # Initialize RAG system (global variable)
-rag_system = LocalRAGSystem(model_name="llama3.1")
+rag_system = LocalRAGSystem(model_name="llama3.1", executor=rag_executor)
 system_ready = False
+init_lock = asyncio.Lock()
+
+# Conversation history storage (in-memory, LRU-bounded)
+MAX_SESSIONS = 10_000
+MAX_TURNS_PER_SESSION = 200
+
+
+def _turn_buffer() -> Deque:
+    return deque(maxlen=MAX_TURNS_PER_SESSION)
+
+
+@dataclass(slots=True)
+class Session:
+    """One conversation stored column-wise: parallel buffers instead of a dict per turn"""
+    questions: Deque[str] = field(default_factory=_turn_buffer)
+    answers: Deque[str] = field(default_factory=_turn_buffer)
+    sources: Deque[list] = field(default_factory=_turn_buffer)
+    timestamps: Deque[str] = field(default_factory=_turn_buffer)
+    
+    def __len__(self) -> int:
+        return len(self.questions)
+    
+    def append(self, question: str, answer: str, sources: list, timestamp: str):
+        self.questions.append(question)
+        self.answers.append(answer)
+        self.sources.append(sources)
+        self.timestamps.append(timestamp)
+    
+    def turns(self) -> List[Dict]:
+        """Materialize all turns as dicts (for API responses)"""
+        return [
+            {"question": q, "answer": a, "sources": s, "timestamp": t}
+            for q, a, s, t in zip(self.questions, self.answers, self.sources, self.timestamps)
+        ]
+    
+    def recent_turns(self, n: int) -> List[Dict]:
+        """The last n turns as question/answer dicts (all the RAG prompt reads)"""
+        start = max(len(self.questions) - n, 0)
+        return [
+            {"question": q, "answer": a}
+            for q, a in zip(islice(self.questions, start, None), islice(self.answers, start, None))
+        ]
+
+
+# Format: {session_id: Session}
+conversation_store: "OrderedDict[str, Session]" = OrderedDict()
+
+# Per-session listing metadata, maintained on write so /conversations never scans turns
+# Format: {session_id: {"conversation_count": 0, "last_updated": "", "first_question": ""}}
+session_meta: Dict[str, Dict] = {}
+
+# Upload settings: accepted file types, 1 MB read chunks, at most 8 concurrent uploads writing to disk
+ALLOWED_EXTENSIONS = frozenset({'.pdf', '.txt', '.docx', '.xlsx', '.xls', '.csv', '.md', '.html', '.pptx', '.ppt'})
+ALLOWED_EXTENSIONS_STR = ", ".join(sorted(ALLOWED_EXTENSIONS))
+UPLOAD_CHUNK_SIZE = 1 << 20
+upload_semaphore = asyncio.Semaphore(8)
+
+# Cached documents folder listing: (folder mtime_ns, file details, ETag). The folder mtime
+# changes when files are added, removed or renamed, but not when a file is overwritten in
+# place; API writes call invalidate_documents_cache(), while in-place edits made outside
+# the API show up only after the next change to the folder
+_docs_cache: Optional[Tuple[int, List[Dict], str]] = None
+EMPTY_DOCUMENTS_ETAG = '"empty"'
+
+
+def save_conversation_turn(session_id: str, question: str, answer: str, sources: list):
+    """Append a turn to a session, evicting the least recently used session when full"""
+    timestamp = datetime.now().isoformat()
+    session = conversation_store.get(session_id)
+    
+    if session is None:
+        session = conversation_store[session_id] = Session()
+        session_meta[session_id] = {
+            "conversation_count": 0,
+            "last_updated": timestamp,
+            "first_question": question[:50] + "..."
+        }
+    else:
+        conversation_store.move_to_end(session_id)
+    
+    session.append(question, answer, sources, timestamp)
+    
+    meta = session_meta[session_id]
+    meta["conversation_count"] = len(session)
+    meta["last_updated"] = timestamp
+    
+    if len(conversation_store) > MAX_SESSIONS:
+        evicted_id, _ = conversation_store.popitem(last=False)
+        session_meta.pop(evicted_id, None)
+
+
+def make_etag(payload: bytes) -> str:
+    """Strong ETag for a response body"""
+    return '"' + hashlib.blake2b(payload, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True when the client's If-None-Match header already covers this ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def documents_listing() -> Tuple[List[Dict], str]:
+    """List document details and their ETag, rescanning only when the documents folder has changed"""
+    global _docs_cache
+    docs_folder = "./documents"
+    
+    try:
+        dir_mtime = os.stat(docs_folder).st_mtime_ns
+    except FileNotFoundError:
+        return [], EMPTY_DOCUMENTS_ETAG
+    
+    if _docs_cache is not None and _docs_cache[0] == dir_mtime:
+        return _docs_cache[1], _docs_cache[2]
+    
+    files = []
+    with os.scandir(docs_folder) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            
+            # DirEntry caches its stat result, so this is one syscall per file
+            file_stat = entry.stat()
+            file_size = file_stat.st_size
+            
+            files.append({
+                "name": entry.name,
+                "type": os.path.splitext(entry.name)[1].lower(),
+                "size_bytes": file_size,
+                "size_kb": round(file_size / 1024, 2),
+                "size_mb": round(file_size / (1024 * 1024), 2),
+                "modified": datetime.fromtimestamp(file_stat.st_mtime).isoformat()
+            })
+    
+    # Sort by modified time (newest first)
+    files.sort(key=itemgetter('modified'), reverse=True)
+    
+    # Hash the listing, so the ETag only changes when the listed details do
+    etag = make_etag(orjson.dumps(files))
+    
+    _docs_cache = (dir_mtime, files, etag)
+    return files, etag
+
+
+def scan_documents() -> List[Dict]:
+    """List document details (cached, see documents_listing)"""
+    return documents_listing()[0]
+
+
+def invalidate_documents_cache():
+    """Force the next documents_listing() call to re-read the documents folder"""
+    global _docs_cache
+    _docs_cache = None
+
+
+async def run_rag(func, *args, **kwargs):
+    """Run a blocking RAG engine call on rag_executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(rag_executor, partial(func, *args, **kwargs))
+
+
+@app.on_event("startup")
+async def configure_threadpool():
+    """Raise the AnyIO threadpool limit (default 40) for blocking calls"""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 100
+    # Download the embedding model in the background if Ollama doesn't have it yet
+    rag_executor.submit(rag_system.ensure_embedding_model)
+    # Load the LLM now so the first question doesn't pay for the cold start
+    app.state.llm_warmup = asyncio.create_task(rag_system.llm.awarmup())
+
+
+@app.on_event("shutdown")
+async def shutdown_rag_executor():
+    """Stop the RAG worker threads and close the Ollama connections"""
+    await rag_system.llm.aclose()
+    # Drop queued work but let running calls finish before their session is closed;
+    # waiting happens in a worker thread so the event loop isn't blocked meanwhile
+    await anyio.to_thread.run_sync(partial(rag_executor.shutdown, wait=True, cancel_futures=True))
+    ollama_session.close()
 
-# Conversation history storage (in-memory)
-# Format: {session_id: [{"question": "", "answer": "", "timestamp": "", "sources": []}]}
-conversation_store: Dict[str, List[Dict]] = {}
 
 # Pydantic models for request/response
+QUESTION_REQUEST_EXAMPLE = {
+    "example": {
+        "question": "What is FastAPI?",
+        "session_id": "optional-session-id"
+    }
+}
+
 class QuestionRequest(BaseModel):
+    # defer_build=False builds the validator at import, not on the first request
+    model_config = ConfigDict(json_schema_extra=QUESTION_REQUEST_EXAMPLE, defer_build=False)
+    
     question: str
     session_id: Optional[str] = None
-    
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "question": "What is FastAPI?",
-                "session_id": "optional-session-id"
-            }
-        }
 
 class AnswerResponse(BaseModel):
     question: str
     answer: str
     sources: list
     session_id: Optional[str] = None
+    cache_hit: bool = False
     
 class StatusResponse(BaseModel):
     status: str
@@ -75,54 +273,58 @@ class ConversationHistoryResponse(BaseModel):
 
 # ==================== API ENDPOINTS ====================
 
+# Static payloads are serialized once at import time
+ROOT_JSON = orjson.dumps({
+    "message": "🚀 Welcome to Local RAG API!",
+    "description": "Powered by Ollama - 100% Local & Free",
+    "version": "2.0.0 - Advanced Features",
+    "new_features": [
+        "🔄 Streaming responses",
+        "💬 Conversation history",
+        "📚 Enhanced document management"
+    ],
+    "documentation": {
+        "swagger_ui": "/docs",
+        "redoc": "/redoc"
+    },
+    "endpoints": {
+        "GET /": "This welcome message",
+        "GET /health": "Check system health",
+        "GET /supported-formats": "List supported file types",
+        "POST /upload": "Upload a document",
+        "POST /upload/stream": "Upload a large document as a raw body",
+        "GET /documents": "List all documents",
+        "DELETE /documents/{filename}": "Delete a document",
+        "POST /initialize": "Process documents and prepare system",
+        "POST /ask": "Ask a question (standard response)",
+        "POST /ask/stream": "Ask a question (streaming response)",
+        "GET /conversations/{session_id}": "Get conversation history",
+        "DELETE /conversations/{session_id}": "Clear conversation history",
+        "DELETE /reset": "Clear all documents and reset system"
+    },
+    "workflow": [
+        "1. Upload documents using POST /upload",
+        "2. Initialize system using POST /initialize",
+        "3. Ask questions using POST /ask or POST /ask/stream",
+        "4. View conversation history using GET /conversations/{session_id}"
+    ]
+})
+
+
 @app.get("/", tags=["General"])
-def root():
+async def root():
     """
     🏠 Welcome endpoint - Shows available API routes
     """
-    return {
-        "message": "🚀 Welcome to Local RAG API!",
-        "description": "Powered by Ollama - 100% Local & Free",
-        "version": "2.0.0 - Advanced Features",
-        "new_features": [
-            "🔄 Streaming responses",
-            "💬 Conversation history",
-            "📚 Enhanced document management"
-        ],
-        "documentation": {
-            "swagger_ui": "/docs",
-            "redoc": "/redoc"
-        },
-        "endpoints": {
-            "GET /": "This welcome message",
-            "GET /health": "Check system health",
-            "GET /supported-formats": "List supported file types",
-            "POST /upload": "Upload a document",
-            "GET /documents": "List all documents",
-            "DELETE /documents/{filename}": "Delete a document",
-            "POST /initialize": "Process documents and prepare system",
-            "POST /ask": "Ask a question (standard response)",
-            "POST /ask/stream": "Ask a question (streaming response)",
-            "GET /conversations/{session_id}": "Get conversation history",
-            "DELETE /conversations/{session_id}": "Clear conversation history",
-            "DELETE /reset": "Clear all documents and reset system"
-        },
-        "workflow": [
-            "1. Upload documents using POST /upload",
-            "2. Initialize system using POST /initialize",
-            "3. Ask questions using POST /ask or POST /ask/stream",
-            "4. View conversation history using GET /conversations/{session_id}"
-        ]
-    }
+    return Response(ROOT_JSON, media_type="application/json")
 
 
 @app.get("/health", response_model=StatusResponse, tags=["General"])
-def health_check():
+async def health_check():
     """
     🏥 Check system health and status
     """
-    docs_folder = "./documents"
-    doc_count = len(os.listdir(docs_folder)) if os.path.exists(docs_folder) else 0
+    doc_count = len(scan_documents())
     
     return StatusResponse(
         status="ready" if system_ready else "not_initialized",
@@ -132,73 +334,62 @@ def health_check():
     )
 
 
+FORMATS_JSON = orjson.dumps({
+    "supported_formats": {
+        "documents": {
+            "PDF": ".pdf",
+            "Word": ".docx",
+            "Text": ".txt",
+            "Markdown": ".md",
+            "HTML": ".html"
+        },
+        "spreadsheets": {
+            "Excel": ".xlsx, .xls",
+            "CSV": ".csv"
+        },
+        "presentations": {
+            "PowerPoint": ".pptx, .ppt"
+        }
+    },
+    "total_formats": 9,
+    "note": "Upload any of these file types using POST /upload"
+})
+FORMATS_ETAG = make_etag(FORMATS_JSON)
+
+
 @app.get("/supported-formats", tags=["General"])
-def get_supported_formats():
+async def get_supported_formats(request: Request):
     """
     📋 List all supported file formats
     """
-    return {
-        "supported_formats": {
-            "documents": {
-                "PDF": ".pdf",
-                "Word": ".docx",
-                "Text": ".txt",
-                "Markdown": ".md",
-                "HTML": ".html"
-            },
-            "spreadsheets": {
-                "Excel": ".xlsx, .xls",
-                "CSV": ".csv"
-            },
-            "presentations": {
-                "PowerPoint": ".pptx, .ppt"
-            }
-        },
-        "total_formats": 9,
-        "note": "Upload any of these file types using POST /upload"
-    }
+    if etag_matches(request, FORMATS_ETAG):
+        return Response(status_code=304, headers={"ETag": FORMATS_ETAG})
+    
+    return Response(FORMATS_JSON, media_type="application/json", headers={"ETag": FORMATS_ETAG})
 
 
 @app.get("/documents", tags=["Document Management"])
-def list_documents():
+async def list_documents(request: Request):
     """
     📚 List all uploaded documents with details
-    """
-    docs_folder = "./documents"
-    
-    if not os.path.exists(docs_folder):
-        return {"documents": [], "count": 0}
     
-    files = []
-    for filename in os.listdir(docs_folder):
-        file_path = os.path.join(docs_folder, filename)
-        
-        if os.path.isfile(file_path) and not filename.startswith('.'):
-            file_ext = os.path.splitext(filename)[1].lower()
-            file_size = os.path.getsize(file_path)
-            
-            files.append({
-                "name": filename,
-                "type": file_ext,
-                "size_kb": round(file_size / 1024, 2),
-                "size_mb": round(file_size / (1024 * 1024), 2),
-                "modified": datetime.fromtimestamp(
-                    os.path.getmtime(file_path)
-                ).isoformat()
-            })
+    Supports conditional GET: send the last ETag in If-None-Match to get a
+    304 Not Modified when nothing has changed.
+    """
+    files, etag = documents_listing()
     
-    # Sort by modified time (newest first)
-    files.sort(key=lambda x: x['modified'], reverse=True)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
     
-    return {
+    return ORJSONResponse({
         "documents": files,
         "count": len(files),
-        "total_size_mb": round(sum(f['size_mb'] for f in files), 2)
-    }
+        "total_size_mb": round(sum(f['size_bytes'] for f in files) / (1024 * 1024), 2)
+    }, headers={"ETag": etag})
 
 
 @app.delete("/documents/{filename}", tags=["Document Management"])
-def delete_document(filename: str):
+async def delete_document(filename: str):
     """
     🗑️ Delete a specific document
     
@@ -212,7 +403,8 @@ def delete_document(filename: str):
         raise HTTPException(status_code=404, detail=f"Document '{filename}' not found")
     
     try:
-        os.remove(file_path)
+        await anyio.to_thread.run_sync(os.remove, file_path)
+        invalidate_documents_cache()
         return {
             "message": f"✅ Document '{filename}' deleted successfully",
             "note": "Remember to call POST /initialize to update the system"
@@ -224,51 +416,37 @@ def delete_document(filename: str):
         )
 
 
-@app.post("/upload", tags=["Document Management"])
-async def upload_document(file: UploadFile = File(...)):
-    """
-    📤 Upload a document (multiple formats supported)
-    
-    - **file**: Document file to upload
-    
-    Supported formats:
-    - PDF (.pdf)
-    - Text (.txt)
-    - Word (.docx)
-    - Excel (.xlsx, .xls)
-    - CSV (.csv)
-    - Markdown (.md)
-    - HTML (.html)
-    - PowerPoint (.pptx, .ppt)
-    
-    The file will be saved to the documents folder for processing.
-    """
+async def save_document(filename: str, chunks: AsyncIterator[bytes]) -> Dict:
+    """Validate the file type and stream chunks into the documents folder"""
     
     # Validate file type
-    allowed_extensions = ['.pdf', '.txt', '.docx', '.xlsx', '.xls', '.csv', '.md', '.html', '.pptx', '.ppt']
-    file_ext = os.path.splitext(file.filename)[1].lower()
+    file_ext = os.path.splitext(filename)[1].lower()
     
-    if file_ext not in allowed_extensions:
+    if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
-            detail=f"File type not supported. Allowed types: {', '.join(allowed_extensions)}"
+            detail=f"File type not supported. Allowed types: {ALLOWED_EXTENSIONS_STR}"
         )
     
     # Create documents folder if it doesn't exist
     os.makedirs("./documents", exist_ok=True)
     
     # Save file
-    file_path = os.path.join("./documents", file.filename)
+    file_path = os.path.join("./documents", filename)
     
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        file_size = os.path.getsize(file_path)
+        # Stream to disk in chunks so large uploads don't block the event loop
+        file_size = 0
+        async with upload_semaphore:
+            async with aiofiles.open(file_path, "wb") as buffer:
+                async for chunk in chunks:
+                    await buffer.write(chunk)
+                    file_size += len(chunk)
+        invalidate_documents_cache()
         
         return {
             "message": "✅ File uploaded successfully!",
-            "filename": file.filename,
+            "filename": filename,
             "size_bytes": file_size,
             "size_kb": round(file_size / 1024, 2),
             "file_type": file_ext,
@@ -283,6 +461,48 @@ async def upload_document(file: UploadFile = File(...)):
         )
 
 
+@app.post("/upload", tags=["Document Management"])
+async def upload_document(file: UploadFile = File(...)):
+    """
+    📤 Upload a document (multiple formats supported)
+    
+    - **file**: Document file to upload
+    
+    Supported formats:
+    - PDF (.pdf)
+    - Text (.txt)
+    - Word (.docx)
+    - Excel (.xlsx, .xls)
+    - CSV (.csv)
+    - Markdown (.md)
+    - HTML (.html)
+    - PowerPoint (.pptx, .ppt)
+    
+    The file will be saved to the documents folder for processing.
+    """
+    
+    async def read_chunks():
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
+    
+    return await save_document(file.filename, read_chunks())
+
+
+@app.post("/upload/stream", tags=["Document Management"])
+async def upload_document_stream(request: Request, filename: str = Query(...)):
+    """
+    📤 Upload a large document as a raw request body
+    
+    - **filename**: Name to save the document as (query parameter)
+    
+    Send the file bytes as the request body (not multipart). The body is
+    written straight to the documents folder as it arrives, skipping the
+    temporary spool file that POST /upload goes through. Prefer this for
+    large files; same supported formats as POST /upload.
+    """
+    return await save_document(os.path.basename(filename), request.stream())
+
+
 @app.post("/initialize", tags=["System Management"])
 async def initialize_system(background_tasks: BackgroundTasks):
     """
@@ -292,7 +512,7 @@ async def initialize_system(background_tasks: BackgroundTasks):
     1. Loads all documents from the documents folder
     2. Splits them into chunks
     3. Creates embeddings using Ollama
-    4. Stores them in Chroma vector database
+    4. Stores them in a FAISS vector index
     
     ⏱️ This may take 2-5 minutes depending on document size.
     """
@@ -306,40 +526,48 @@ async def initialize_system(background_tasks: BackgroundTasks):
             detail="No documents found. Please upload documents first using POST /upload"
         )
     
-    try:
-        print("\n" + "="*50)
-        print("🚀 Starting system initialization...")
-        print("="*50 + "\n")
-        
-        # Initialize the RAG system
-        success = rag_system.initialize_from_documents(docs_folder)
-        
-        if success:
-            system_ready = True
-            doc_count = len(os.listdir(docs_folder))
-            
+    # Only one indexing run at a time; concurrent calls would double-index documents
+    if init_lock.locked():
+        raise HTTPException(
+            status_code=409,
+            detail="Initialization already in progress. Please wait for it to finish."
+        )
+    
+    async with init_lock:
+        try:
             print("\n" + "="*50)
-            print("✅ System initialization complete!")
+            print("🚀 Starting system initialization...")
             print("="*50 + "\n")
             
-            return {
-                "message": "✅ System initialized successfully!",
-                "status": "ready",
-                "documents_processed": doc_count,
-                "next_step": "You can now ask questions using POST /ask"
-            }
-        else:
+            # Initialize the RAG system (on the RAG pool so /health keeps responding)
+            success = await run_rag(rag_system.initialize_from_documents, docs_folder)
+            
+            if success:
+                system_ready = True
+                doc_count = len(os.listdir(docs_folder))
+                
+                print("\n" + "="*50)
+                print("✅ System initialization complete!")
+                print("="*50 + "\n")
+                
+                return {
+                    "message": "✅ System initialized successfully!",
+                    "status": "ready",
+                    "documents_processed": doc_count,
+                    "next_step": "You can now ask questions using POST /ask"
+                }
+            else:
+                raise HTTPException(
+                    status_code=500,
+                    detail="Failed to initialize system. Check server logs for details."
+                )
+                
+        except Exception as e:
+            system_ready = False
             raise HTTPException(
                 status_code=500,
-                detail="Failed to initialize system. Check server logs for details."
+                detail=f"Error during initialization: {str(e)}"
             )
-            
-    except Exception as e:
-        system_ready = False
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error during initialization: {str(e)}"
-        )
 
 
 @app.post("/ask", response_model=AnswerResponse, tags=["Question Answering"])
@@ -366,33 +594,27 @@ async def ask_question(request: QuestionRequest):
     
     try:
         # Generate or use provided session ID
-        session_id = request.session_id or str(uuid.uuid4())
+        session_id = request.session_id or secrets.token_hex(16)
         
         # Get conversation history if exists
-        history = conversation_store.get(session_id, [])
+        session = conversation_store.get(session_id)
+        history = session.recent_turns(PROMPT_HISTORY_TURNS) if session else []
         
         # Ask the question with conversation context
-        result = rag_system.ask(request.question, conversation_history=history)
+        result = await rag_system.ask(request.question, conversation_history=history)
         
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
         
         # Store in conversation history
-        conversation_entry = {
-            "question": result["question"],
-            "answer": result["answer"],
-            "sources": result["sources"],
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        if session_id not in conversation_store:
-            conversation_store[session_id] = []
-        conversation_store[session_id].append(conversation_entry)
+        save_conversation_turn(session_id, result["question"], result["answer"], result["sources"])
         
         # Add session_id to response
         result["session_id"] = session_id
         
-        return AnswerResponse(**result)
+        # result already matches AnswerResponse; returning a response directly
+        # skips FastAPI's output re-validation and serializes once with orjson
+        return ORJSONResponse(result)
         
     except HTTPException:
         raise
@@ -432,49 +654,39 @@ async def ask_question_stream(request: QuestionRequest):
         )
     
     # Generate or use provided session ID
-    session_id = request.session_id or str(uuid.uuid4())
+    session_id = request.session_id or secrets.token_hex(16)
     
     # Get conversation history if exists
-    history = conversation_store.get(session_id, [])
+    session = conversation_store.get(session_id)
+    history = session.recent_turns(PROMPT_HISTORY_TURNS) if session else []
     
     async def generate():
         """Generator function for streaming response"""
-        full_answer = ""
+        answer_parts: List[str] = []
         sources = []
         
         try:
-            for chunk_json in rag_system.ask_stream(request.question, conversation_history=history):
-                chunk_data = json.loads(chunk_json)
-                
+            async for chunk_data in rag_system.ask_stream(request.question, conversation_history=history):
                 # Store sources when we get them
                 if "sources" in chunk_data:
                     sources = chunk_data["sources"]
                 
                 # Accumulate answer chunks
                 if "answer_chunk" in chunk_data and chunk_data["answer_chunk"]:
-                    full_answer += chunk_data["answer_chunk"]
+                    answer_parts.append(chunk_data["answer_chunk"])
                 
                 # Yield the chunk
-                yield f"data: {chunk_json}\n\n"
+                yield b"data: " + orjson.dumps(chunk_data) + b"\n\n"
                 
                 # If done, store in conversation history
                 if chunk_data.get("done", False):
+                    full_answer = "".join(answer_parts)
                     if full_answer and session_id:
-                        conversation_entry = {
-                            "question": request.question,
-                            "answer": full_answer,
-                            "sources": sources,
-                            "timestamp": datetime.now().isoformat()
-                        }
-                        
-                        if session_id not in conversation_store:
-                            conversation_store[session_id] = []
-                        conversation_store[session_id].append(conversation_entry)
+                        save_conversation_turn(session_id, request.question, full_answer, sources)
                     break
                     
         except Exception as e:
-            error_json = json.dumps({"error": str(e), "done": True})
-            yield f"data: {error_json}\n\n"
+            yield b"data: " + orjson.dumps({"error": str(e), "done": True}) + b"\n\n"
     
     return StreamingResponse(
         generate(),
@@ -488,31 +700,34 @@ async def ask_question_stream(request: QuestionRequest):
 
 
 @app.get("/conversations", tags=["Conversation History"])
-def list_all_sessions():
+async def list_all_sessions(
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0)
+):
     """
     📜 List all conversation sessions
     
-    Returns a list of all active session IDs with metadata.
+    - **limit**: Optional maximum number of sessions to return
+    - **offset**: Number of sessions to skip (for pagination)
+    
+    Returns active session IDs with metadata, most recently updated first.
     """
-    sessions = []
-    
-    for session_id, history in conversation_store.items():
-        if history:
-            sessions.append({
-                "session_id": session_id,
-                "conversation_count": len(history),
-                "last_updated": history[-1]["timestamp"],
-                "first_question": history[0]["question"][:50] + "..."
-            })
+    # conversation_store is kept in LRU order, so walking it backwards yields
+    # newest-first without sorting; only the requested page is materialized
+    stop = offset + limit if limit is not None else None
+    sessions = [
+        {"session_id": session_id, **session_meta[session_id]}
+        for session_id in islice(reversed(conversation_store), offset, stop)
+    ]
     
     return {
-        "active_sessions": len(sessions),
+        "active_sessions": len(conversation_store),
         "sessions": sessions
     }
 
 
 @app.get("/conversations/{session_id}", response_model=ConversationHistoryResponse, tags=["Conversation History"])
-def get_conversation_history(session_id: str):
+async def get_conversation_history(session_id: str):
     """
     📖 Get conversation history for a session
     
@@ -527,17 +742,18 @@ def get_conversation_history(session_id: str):
             detail=f"Session '{session_id}' not found"
         )
     
-    history = conversation_store[session_id]
+    session = conversation_store[session_id]
     
-    return ConversationHistoryResponse(
-        session_id=session_id,
-        conversation_count=len(history),
-        conversations=history
-    )
+    # Entries are built by save_conversation_turn, so skip re-validating each one
+    return ORJSONResponse({
+        "session_id": session_id,
+        "conversation_count": len(session),
+        "conversations": session.turns()
+    })
 
 
 @app.delete("/conversations/{session_id}", tags=["Conversation History"])
-def clear_conversation_history(session_id: str):
+async def clear_conversation_history(session_id: str):
     """
     🗑️ Clear conversation history for a session
     
@@ -553,6 +769,7 @@ def clear_conversation_history(session_id: str):
         )
     
     del conversation_store[session_id]
+    session_meta.pop(session_id, None)
     
     return {
         "message": f"✅ Conversation history for session '{session_id}' cleared",
@@ -561,7 +778,7 @@ def clear_conversation_history(session_id: str):
 
 
 @app.delete("/conversations", tags=["Conversation History"])
-def clear_all_conversations():
+async def clear_all_conversations():
     """
     🗑️ Clear all conversation histories
     
@@ -570,6 +787,7 @@ def clear_all_conversations():
     
     count = len(conversation_store)
     conversation_store.clear()
+    session_meta.clear()
     
     return {
         "message": f"✅ Cleared {count} conversation session(s)",
@@ -586,30 +804,38 @@ async def reset_system():
     """
     global system_ready
     
-    try:
-        # Delete documents folder
-        if os.path.exists("./documents"):
-            shutil.rmtree("./documents")
-            os.makedirs("./documents")
-        
-        # Delete vector database
-        if os.path.exists("./chroma_db"):
-            shutil.rmtree("./chroma_db")
-        
-        # Reset system
-        system_ready = False
-        
-        return {
-            "message": "✅ System reset successfully!",
-            "status": "reset",
-            "note": "You can now upload new documents"
-        }
-        
-    except Exception as e:
+    # Deleting files under a running /initialize would leave a half-written index
+    if init_lock.locked():
         raise HTTPException(
-            status_code=500,
-            detail=f"Error resetting system: {str(e)}"
+            status_code=409,
+            detail="Initialization in progress. Please wait for it to finish before resetting."
         )
+    
+    async with init_lock:
+        try:
+            # Delete documents folder (in a worker thread; large trees can take seconds)
+            await anyio.to_thread.run_sync(partial(shutil.rmtree, "./documents", ignore_errors=True))
+            await anyio.to_thread.run_sync(partial(os.makedirs, "./documents", exist_ok=True))
+            invalidate_documents_cache()
+            
+            # Delete vector database
+            await anyio.to_thread.run_sync(partial(shutil.rmtree, rag_system.db_path, ignore_errors=True))
+            
+            # Reset system
+            rag_system.clear_index()
+            system_ready = False
+            
+            return {
+                "message": "✅ System reset successfully!",
+                "status": "reset",
+                "note": "You can now upload new documents"
+            }
+            
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error resetting system: {str(e)}"
+            )
 
 
 # Run the application
@@ -626,9 +852,13 @@ if __name__ == "__main__":
     print("\n💡 Tip: Use Swagger UI for interactive testing!")
     print("="*60 + "\n")
     
+    # Single worker on purpose: documents index, system_ready and conversation
+    # history all live in process memory and would diverge across workers
     uvicorn.run(
         app,
         host="0.0.0.0",
         port=8000,
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )
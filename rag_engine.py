@@ -4,15 +4,31 @@ Fixed to include initialize_from_documents method
 """
 
 import os
-import json
-from typing import List, Dict
+import math
+import sqlite3
+import uuid
+import hashlib
+import threading
+import time
+import bisect
+import functools
+from collections import OrderedDict
+from contextlib import closing
+from dataclasses import dataclass
+from typing import List, Dict, Set, Optional
+import asyncio
 import requests
+import httpx
+import orjson
+import faiss
+import numpy as np
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # LangChain imports
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import (
     PyPDFLoader, 
-    TextLoader,
     Docx2txtLoader,
     UnstructuredExcelLoader,
     CSVLoader,
@@ -20,9 +36,188 @@ from langchain_community.document_loaders import (
     UnstructuredHTMLLoader,
     UnstructuredPowerPointLoader
 )
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import OllamaEmbeddings
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# Dedicated embedding model: a small encoder like nomic-embed-text embeds ~10x faster
+# than running the generative LLM as embedder, for a few points less on MTEB
+EMBED_MODEL = os.environ.get("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+
+# How long Ollama keeps the LLM (and its prompt-prefix cache) loaded between requests
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+# Fixed context window and answer length so Ollama sizes the KV cache once and
+# never reloads the model for a different num_ctx
+OLLAMA_OPTIONS = {
+    "num_ctx": int(os.environ.get("OLLAMA_NUM_CTX", "4096")),
+    "num_predict": int(os.environ.get("OLLAMA_NUM_PREDICT", "512"))
+}
+
+# Texts per /api/embed request when indexing
+EMBED_BATCH_SIZE = int(os.environ.get("OLLAMA_EMBED_BATCH_SIZE", "32"))
+
+
+def create_ollama_session() -> requests.Session:
+    """HTTP session with a keep-alive connection pool for talking to Ollama"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.2)
+    )
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+# Used by the embeddings (which run on worker threads during indexing)
+ollama_session = create_ollama_session()
+
+
+def create_ollama_async_client(base_url: str) -> httpx.AsyncClient:
+    """Async HTTP client for generation, so answers stream without tying up a thread"""
+    # Ollama only speaks HTTP/1.1, so connections are pooled rather than multiplexed
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=120,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=32),
+        transport=httpx.AsyncHTTPTransport(retries=3)
+    )
+
+
+class EmbeddingCache:
+    """
+    SQLite store of chunk embeddings keyed by sha256(model, text), so re-indexing skips Ollama for seen chunks
+    Vectors are stored as int8 with a per-vector float32 scale (~4x smaller, cosine error ~1e-4)
+    """
+    
+    # Stay under SQLite's bound-parameter limit in "IN (...)" lookups
+    LOOKUP_BATCH = 500
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    def connect(self) -> sqlite3.Connection:
+        # A connection per call: cheap, thread-safe, and survives /reset deleting the folder
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_int8 (key TEXT PRIMARY KEY, vec BLOB)")
+        return conn
+    
+    @staticmethod
+    def encode(vector) -> bytes:
+        """float32 scale followed by the int8 components (symmetric, zero-point 0)"""
+        values = np.asarray(vector, dtype=np.float32)
+        scale = float(np.abs(values).max()) / 127 or 1.0
+        return np.float32(scale).tobytes() + np.round(values / scale).astype(np.int8).tobytes()
+    
+    @staticmethod
+    def decode(blob: bytes) -> List[float]:
+        scale = np.frombuffer(blob, dtype=np.float32, count=1)[0]
+        return (np.frombuffer(blob, dtype=np.int8, offset=4).astype(np.float32) * scale).tolist()
+    
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{text}".encode()).hexdigest()
+    
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Cached vectors for whichever keys are present"""
+        found = {}
+        with closing(self.connect()) as conn:
+            for start in range(0, len(keys), self.LOOKUP_BATCH):
+                batch = keys[start:start + self.LOOKUP_BATCH]
+                rows = conn.execute(
+                    f"SELECT key, vec FROM cache_int8 WHERE key IN ({','.join('?' * len(batch))})", batch
+                )
+                for key, vec in rows:
+                    found[key] = self.decode(vec)
+        return found
+    
+    def put_many(self, items: List[tuple]) -> Dict[str, List[float]]:
+        """Store (key, vector) pairs; returns the vectors as get_many will read them back"""
+        rows = [(key, self.encode(vec)) for key, vec in items]
+        with closing(self.connect()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO cache_int8 (key, vec) VALUES (?, ?)", rows)
+        return {key: self.decode(blob) for key, blob in rows}
+
+
+class OllamaBatchEmbeddings(Embeddings):
+    """Ollama embeddings that send many texts per request via /api/embed"""
+    
+    def __init__(self, model: str = "llama2", base_url: str = "http://localhost:11434",
+                 batch_size: int = EMBED_BATCH_SIZE):
+        self.model = model
+        self.base_url = base_url
+        self.batch_size = batch_size
+        self.session = ollama_session
+        # Cleared once Ollama answers 404 for /api/embed, so later batches skip the probe
+        self.batch_supported = True
+        # Optional EmbeddingCache for document chunks (queries aren't persisted)
+        self.cache = None
+    
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch in one round-trip, falling back to per-text calls on older Ollama"""
+        if self.batch_supported:
+            response = self.session.post(
+                f"{self.base_url}/api/embed",
+                json={"model": self.model, "input": texts},
+                timeout=60
+            )
+            
+            if response.ok:
+                embeddings = orjson.loads(response.content).get("embeddings")
+                if embeddings is not None:
+                    return embeddings
+            elif response.status_code == 404 and b"model" not in response.content:
+                # Route missing (Ollama < 0.3), as opposed to the model not being pulled
+                self.batch_supported = False
+        
+        # Older Ollama versions only have the single-text /api/embeddings route
+        return [self._embed_one(text) for text in texts]
+    
+    def _embed_one(self, text: str) -> List[float]:
+        response = self.session.post(
+            f"{self.base_url}/api/embeddings",
+            json={"model": self.model, "prompt": text},
+            timeout=60
+        )
+        response.raise_for_status()
+        
+        # /api/embed returns unit vectors; match that so inner product == cosine
+        embedding = orjson.loads(response.content)["embedding"]
+        norm = math.sqrt(sum(x * x for x in embedding)) or 1.0
+        return [x / norm for x in embedding]
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed document chunks in batches of batch_size, reusing cached vectors when available"""
+        if self.cache is None:
+            return self._embed_uncached(texts)
+        
+        keys = [EmbeddingCache.key(self.model, text) for text in texts]
+        cached = self.cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        
+        if missing:
+            vectors = self._embed_uncached([texts[i] for i in missing])
+            # Index the int8 round-tripped vectors, so a chunk gets the same vector
+            # whether or not it was already cached
+            cached.update(self.cache.put_many([(keys[i], vec) for i, vec in zip(missing, vectors)]))
+        
+        return [cached[key] for key in keys]
+    
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            embeddings.extend(self._embed_batch(texts[start:start + self.batch_size]))
+        return embeddings
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        return self._embed_batch([text])[0]
+
 
 class OllamaLLM:
     """Custom wrapper for Ollama LLM with streaming support"""
@@ -30,51 +225,483 @@ class OllamaLLM:
     def __init__(self, model_name: str = "llama2"):
         self.model_name = model_name
         self.base_url = "http://localhost:11434"
+        self.client = create_ollama_async_client(self.base_url)
     
-    def generate(self, prompt: str) -> str:
+    async def agenerate(self, prompt: str) -> str:
         """Generate text using Ollama (non-streaming)"""
-        url = f"{self.base_url}/api/generate"
-        
         payload = {
             "model": self.model_name,
             "prompt": prompt,
-            "stream": False
+            "stream": False,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": OLLAMA_OPTIONS
         }
         
         try:
-            response = requests.post(url, json=payload, timeout=120)
+            response = await self.client.post("/api/generate", json=payload)
             response.raise_for_status()
-            return response.json()["response"]
+            return orjson.loads(response.content)["response"]
         except Exception as e:
             return f"Error generating response: {str(e)}"
     
-    def generate_stream(self, prompt: str):
+    async def agenerate_stream(self, prompt: str):
         """Generate text using Ollama with streaming"""
-        url = f"{self.base_url}/api/generate"
-        
         payload = {
             "model": self.model_name,
             "prompt": prompt,
-            "stream": True
+            "stream": True,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": OLLAMA_OPTIONS
         }
         
         try:
-            response = requests.post(url, json=payload, stream=True, timeout=120)
-            response.raise_for_status()
-            
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        chunk = json.loads(line)
+            async with self.client.stream("POST", "/api/generate", json=payload) as response:
+                response.raise_for_status()
+                
+                # Ollama sends one JSON object per line; split raw network chunks ourselves
+                buffer = bytearray()
+                async for data in response.aiter_bytes():
+                    buffer += data
+                    end = buffer.rfind(b"\n")
+                    if end == -1:
+                        continue
+                    # orjson parses straight from the bytes; only complete lines are consumed
+                    lines = buffer[:end].split(b"\n")
+                    del buffer[:end + 1]
+                    for line in lines:
+                        if not line:
+                            continue
+                        try:
+                            chunk = orjson.loads(line)
+                        except orjson.JSONDecodeError:
+                            continue
                         if "response" in chunk:
                             yield chunk["response"]
                         if chunk.get("done", False):
-                            break
-                    except json.JSONDecodeError:
-                        continue
+                            return
                         
         except Exception as e:
             yield f"Error generating response: {str(e)}"
+    
+    async def awarmup(self):
+        """Load the model into memory ahead of the first question (an empty prompt generates nothing)"""
+        payload = {
+            "model": self.model_name,
+            "prompt": "",
+            "stream": False,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": OLLAMA_OPTIONS
+        }
+        
+        try:
+            response = await self.client.post("/api/generate", json=payload)
+            response.raise_for_status()
+            print(f"🔥 {self.model_name} loaded and warm")
+        except Exception as e:
+            print(f"⚠️  Could not warm up {self.model_name}: {e}")
+    
+    async def aclose(self):
+        """Close the pooled connections to Ollama"""
+        await self.client.aclose()
+
+
+def hash_file(filepath: str) -> str:
+    """SHA-256 of a file's contents, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Exhaustive inner-product search is fastest for small corpora; past this many
+# vectors switch to an HNSW graph for O(log n) search
+HNSW_MIN_VECTORS = int(os.environ.get("FAISS_HNSW_MIN_VECTORS", "100000"))
+
+# HNSW graph degree and build/search beam widths; raise HNSW_EF_SEARCH for
+# recall, lower it for latency (applied to new and loaded indexes)
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = int(os.environ.get("FAISS_HNSW_EF_SEARCH", "64"))
+
+
+def quantizer_storage(index: faiss.Index) -> Optional[faiss.IndexScalarQuantizer]:
+    """The int8 storage of a flat or HNSW scalar-quantized index (None for other index types)"""
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    return index if isinstance(index, faiss.IndexScalarQuantizer) else None
+
+
+def has_unit_range(index: faiss.Index) -> bool:
+    """True unless the index is int8-quantized over a range other than [-1, 1]"""
+    storage = quantizer_storage(index)
+    if storage is None:
+        return True
+    # QT_8bit stores each dimension's minimum followed by its range width
+    trained = faiss.vector_to_array(storage.sq.trained)
+    return np.allclose(trained[:storage.d], -1.0) and np.allclose(trained[storage.d:], 2.0)
+
+
+def new_faiss_index(dim: int, expected_vectors: int) -> faiss.Index:
+    """
+    Empty, trained inner-product FAISS index sized for the expected corpus
+    Vectors are stored as int8 (4x smaller than float32)
+    """
+    if expected_vectors < HNSW_MIN_VECTORS:
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        storage = index
+    else:
+        index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        storage = faiss.downcast_index(index.storage)
+    
+    # Embeddings are unit vectors, so every component lies in [-1, 1]. Training on those
+    # fixed bounds instead of a sample of the data means vectors added by later
+    # incremental updates can never fall outside the quantizer's range and get clipped
+    storage.sq.rangestat = faiss.ScalarQuantizer.RS_minmax
+    storage.sq.rangestat_arg = 0
+    index.train(np.array([[-1.0] * dim, [1.0] * dim], dtype=np.float32))
+    return index
+
+
+# Chunks embedded and added to the index per step in create_vectorstore
+ADD_BATCH_SIZE = 500
+
+# Below this many files, load_documents parses serially instead of in a process pool
+PARALLEL_LOAD_MIN_FILES = 4
+
+# Loader workers (default: one per core) and pool type; "thread" skips process
+# start-up and pickling, and suits loaders that mostly release the GIL (pypdfium2)
+LOAD_WORKERS = int(os.environ.get("RAG_LOAD_WORKERS", "0")) or os.cpu_count() or 1
+LOAD_EXECUTOR = ThreadPoolExecutor if os.environ.get("RAG_LOAD_EXECUTOR") == "thread" else ProcessPoolExecutor
+
+# IMPROVED: Smaller chunks with good overlap
+CHUNK_SIZE = 500      # Smaller for better precision
+CHUNK_OVERLAP = 100   # Good overlap for context
+
+# Preferred cut points, best first; a cut must leave the chunk at least half full
+SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
+def split_text(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into overlapping chunks, cutting at the best separator near each chunk's end"""
+    chunks = []
+    start = 0
+    length = len(text)
+    
+    while start < length:
+        end = min(start + chunk_size, length)
+        if end < length:
+            # str.rfind scans in C, so each chunk costs a handful of calls
+            for sep in SEPARATORS:
+                cut = text.rfind(sep, start + chunk_size // 2, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end == length:
+            break
+        
+        # Start the next chunk ~chunk_overlap chars back, on a word boundary
+        next_start = max(end - chunk_overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    
+    return chunks
+
+
+# split_text handles ~4 MB/s per core, so processes only pay off (pickling the text
+# both ways) for large corpora on multi-core machines
+PARALLEL_SPLIT_MIN_DOCS = 8
+PARALLEL_SPLIT_MIN_CHARS = 16_000_000
+
+
+# MMR re-ranking: candidates fetched per query and relevance/diversity balance (1 = pure relevance)
+MMR_MIN_FETCH = 20
+MMR_LAMBDA = 0.5
+
+
+# Retrieval results cached per (query, k); repeat questions skip embedding + search
+RETRIEVAL_CACHE_SIZE = 256
+
+
+# Chunk metadata the engine keeps for itself: the stored preview is already sent as
+# content_preview, and file hashes only matter for incremental indexing
+INTERNAL_METADATA_KEYS = frozenset({"preview", "file_hash"})
+
+
+@dataclass(slots=True)
+class RelevantDoc:
+    """A retrieved chunk; turned into a plain dict only for API responses"""
+    content: str
+    metadata: Dict
+    relevance_score: float
+    relevance_rank: int
+    
+    def to_source(self) -> Dict:
+        """Source entry as returned to clients"""
+        return {
+            # Chunks indexed before previews were stored fall back to slicing
+            "content_preview": self.metadata.get("preview") or self.content[:200] + "...",
+            "metadata": {key: value for key, value in self.metadata.items() if key not in INTERNAL_METADATA_KEYS},
+            "relevance_score": self.relevance_score
+        }
+
+
+# Near-duplicate first-turn questions reuse a recent answer instead of calling the LLM.
+# The cache is shared by every session, so one user could be served another user's answer
+# to a similar question; it is opt-in (SEMANTIC_CACHE=1) for single-user deployments
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_TTL = 300
+SEMANTIC_CACHE_SIZE = 1024
+
+
+class SemanticCache:
+    """Recent answers indexed by question embedding; a hit needs cosine similarity >= threshold"""
+    
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, ttl: float = SEMANTIC_CACHE_TTL,
+                 max_entries: int = SEMANTIC_CACHE_SIZE):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.index = None
+        self.results: List[Dict] = []
+        self.timestamps: List[float] = []
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def as_unit_row(vector) -> np.ndarray:
+        row = np.asarray(vector, dtype=np.float32).reshape(1, -1).copy()
+        faiss.normalize_L2(row)
+        return row
+    
+    def drop_oldest(self, count: int):
+        """Remove the first `count` entries (entries are stored oldest first)"""
+        if count:
+            self.index.remove_ids(np.arange(count, dtype=np.int64))
+            del self.results[:count]
+            del self.timestamps[:count]
+    
+    def drop_expired(self):
+        self.drop_oldest(bisect.bisect_left(self.timestamps, time.monotonic() - self.ttl))
+    
+    def get(self, vector) -> Optional[Dict]:
+        """Cached result for the closest recent question, if it is similar enough"""
+        with self.lock:
+            if self.index is None:
+                return None
+            self.drop_expired()
+            if not self.results:
+                return None
+            scores, positions = self.index.search(self.as_unit_row(vector), 1)
+            if scores[0, 0] >= self.threshold:
+                return self.results[positions[0, 0]]
+            return None
+    
+    def put(self, vector, result: Dict):
+        with self.lock:
+            row = self.as_unit_row(vector)
+            if self.index is None:
+                self.index = faiss.IndexFlatIP(row.shape[1])
+            self.drop_expired()
+            self.drop_oldest(max(0, len(self.results) + 1 - self.max_entries))
+            self.index.add(row)
+            self.results.append(result)
+            self.timestamps.append(time.monotonic())
+    
+    def clear(self):
+        with self.lock:
+            self.index = None
+            self.results = []
+            self.timestamps = []
+
+
+# Prefill time grows linearly with prompt length, so retrieved context is packed in rank
+# order until this many (estimated) tokens, or less if the prompt budget runs out first
+MAX_CONTEXT_TOKENS = int(os.environ.get("RAG_MAX_CONTEXT_TOKENS", "3000"))
+
+# The whole prompt has to fit in num_ctx next to the answer; past that Ollama silently
+# drops the front of the prompt, which is where the instructions are
+PROMPT_TOKEN_BUDGET = OLLAMA_OPTIONS["num_ctx"] - OLLAMA_OPTIONS["num_predict"]
+
+
+# Most recent conversation turns included in the prompt
+PROMPT_HISTORY_TURNS = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return len(text) // 4
+
+
+# IMPROVED PROMPT: Strict instructions. Kept byte-identical across requests and placed
+# first, so Ollama can reuse the cached KV state for this prefix instead of re-prefilling it
+PROMPT_INSTRUCTIONS = """You are a helpful assistant. Answer the question using ONLY the information provided in the Context below.
+
+CRITICAL RULES:
+1. Use ONLY information from the Context documents below
+2. If the answer is not in the Context, say "I don't have that information in the provided documents"
+3. Do NOT use your general knowledge
+4. Do NOT make up information
+5. Cite the document source when possible
+
+Context from uploaded documents:
+"""
+
+PROMPT_QUESTION_PREFIX = "\n\nQuestion: "
+PROMPT_ANSWER_CUE = "\n\nAnswer (based ONLY on Context above):"
+PROMPT_HISTORY_HEADER = "\n\nPrevious conversation:\n"
+
+
+# Loader metadata kept on each chunk; string values are capped at METADATA_MAX_CHARS
+CHUNK_METADATA_KEYS = ("filename", "page", "file_hash")
+METADATA_MAX_CHARS = 256
+
+
+def chunk_metadata(doc: Document) -> Dict:
+    """The whitelisted, length-capped subset of a loaded document's metadata"""
+    metadata = {}
+    for key in CHUNK_METADATA_KEYS:
+        value = doc.metadata.get(key)
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = value[:METADATA_MAX_CHARS]
+        metadata[key] = value
+    return metadata
+
+
+def retrieval_cache_key(query: str, k: int, generation: int) -> str:
+    """Cache key for a query: whitespace/case-insensitive, tied to the index generation"""
+    digest = hashlib.blake2b(query.strip().lower().encode(), digest_size=16).hexdigest()
+    return f"{generation}:{k}:{digest}"
+
+
+# PDFs with at least this many pages are split into page ranges extracted by parallel processes
+PARALLEL_PDF_MIN_PAGES = int(os.environ.get("RAG_PARALLEL_PDF_MIN_PAGES", "64"))
+
+
+def extract_pdf_pages(filepath: str, start: int, stop: int) -> List[Document]:
+    """
+    One Document per page in [start, stop) via pypdfium2
+    Module-level so ProcessPoolExecutor workers can pickle it
+    """
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(filepath)
+    try:
+        return [
+            Document(page_content=pdf[i].get_textpage().get_text_range(),
+                     metadata={"source": filepath, "page": i})
+            for i in range(start, stop)
+        ]
+    finally:
+        pdf.close()
+
+
+def load_pdf(filepath: str, max_workers: int = 1) -> List[Document]:
+    """
+    One Document per PDF page, via pypdfium2 when installed (several times faster than pypdf)
+    Large PDFs are split across up to max_workers processes; keep the default of 1 when
+    already running inside a loader pool, so workers don't each start a pool of their own
+    """
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        return PyPDFLoader(filepath).load()
+    
+    pdf = pdfium.PdfDocument(filepath)
+    try:
+        page_count = len(pdf)
+    finally:
+        pdf.close()
+    
+    # pdfium holds a global lock, so only separate processes extract pages concurrently
+    workers = min(max_workers, page_count // (PARALLEL_PDF_MIN_PAGES // 2 or 1))
+    if workers < 2 or page_count < PARALLEL_PDF_MIN_PAGES:
+        return extract_pdf_pages(filepath, 0, page_count)
+    
+    step = math.ceil(page_count / workers)
+    starts = range(0, page_count, step)
+    stops = [min(start + step, page_count) for start in starts]
+    with ProcessPoolExecutor(max_workers=len(starts)) as executor:
+        ranges = executor.map(extract_pdf_pages, [filepath] * len(starts), starts, stops)
+        return [doc for docs in ranges for doc in docs]
+
+
+def load_text(filepath: str) -> List[Document]:
+    """Plain text needs no loader: read and decode in one go"""
+    with open(filepath, "rb") as f:
+        content = f.read().decode("utf-8", errors="replace")
+    return [Document(page_content=content, metadata={"source": filepath})]
+
+
+def load_excel(filepath: str) -> List[Document]:
+    """Excel via Unstructured, falling back to pandas"""
+    try:
+        return UnstructuredExcelLoader(filepath).load()
+    except Exception:
+        import pandas as pd
+        df = pd.read_excel(filepath)
+        return [Document(page_content=df.to_string(), metadata={"source": os.path.basename(filepath)})]
+
+
+def langchain_loader(loader_cls):
+    """Adapt a LangChain loader class to the filepath -> documents signature"""
+    return lambda filepath: loader_cls(filepath).load()
+
+
+# Extension -> (log label, loader); load_file dispatches on this instead of an if/elif chain
+EXT_TO_LOADER = {
+    '.pdf': ("PDF", load_pdf),
+    '.txt': ("Text", load_text),
+    '.docx': ("Word", langchain_loader(Docx2txtLoader)),
+    '.xlsx': ("Excel", load_excel),
+    '.xls': ("Excel", load_excel),
+    '.csv': ("CSV", langchain_loader(CSVLoader)),
+    '.md': ("Markdown", langchain_loader(UnstructuredMarkdownLoader)),
+    '.html': ("HTML", langchain_loader(UnstructuredHTMLLoader)),
+    '.htm': ("HTML", langchain_loader(UnstructuredHTMLLoader)),
+    '.pptx': ("PowerPoint", langchain_loader(UnstructuredPowerPointLoader)),
+    '.ppt': ("PowerPoint", langchain_loader(UnstructuredPowerPointLoader)),
+}
+
+
+def load_file(filepath: str, pdf_workers: int = 1) -> List[Document]:
+    """
+    Load a single file with the loader for its extension (pdf_workers: see load_pdf)
+    Module-level so ProcessPoolExecutor workers can pickle it
+    """
+    filename = os.path.basename(filepath)
+    
+    # Determine loader based on file extension
+    ext = os.path.splitext(filename)[1].lower()
+    entry = EXT_TO_LOADER.get(ext)
+    if entry is None:
+        print(f"  ⚠️  Unsupported: {filename}")
+        return []
+    
+    label, load = entry
+    try:
+        docs = load_pdf(filepath, max_workers=pdf_workers) if ext == '.pdf' else load(filepath)
+    except Exception as e:
+        print(f"  ❌ Error loading {filename}: {str(e)}")
+        return []
+    
+    if ext == '.pdf':
+        print(f"  ✅ {label}: {filename} ({len(docs)} pages)")
+    else:
+        print(f"  ✅ {label}: {filename}")
+    
+    # Add filename to metadata
+    for doc in docs:
+        doc.metadata['filename'] = filename
+    
+    return docs
 
 
 class LocalRAGSystem:
@@ -84,138 +711,295 @@ class LocalRAGSystem:
     """
     
     def __init__(self, model_name: str = "llama3.1", documents_path: str = "./documents", 
-                 db_path: str = "./chroma_db"):
+                 db_path: str = "./vector_db", embedding_model_name: str = EMBED_MODEL,
+                 max_context_tokens: int = MAX_CONTEXT_TOKENS, executor: Optional[Executor] = None):
         self.model_name = model_name
+        # Where the async methods run blocking embedding/search calls (None = the loop's default)
+        self.executor = executor
+        self.max_context_tokens = max_context_tokens
+        self.embedding_model_name = embedding_model_name
         self.documents_path = documents_path
         self.db_path = db_path
         self.llm = OllamaLLM(model_name)
-        self.embeddings = OllamaEmbeddings(model=model_name)
+        self.embeddings = OllamaBatchEmbeddings(model=embedding_model_name)
+        self.embeddings.cache = EmbeddingCache(os.path.join(db_path, "emb_cache.sqlite"))
+        # Per-instance LRU of query vectors; unlike the retrieval cache it survives re-indexing
+        self.embed_query_cached = functools.lru_cache(maxsize=1024)(
+            lambda query: tuple(self.embeddings.embed_query(query))
+        )
         self.vectorstore = None
         self.documents = []
         
+        # Incremental indexing: {filename: {"hash": sha256, "ids": [chunk ids]}} for
+        # what is embedded in the vectorstore, and the hashes of the current files
+        self.manifest_path = os.path.join(db_path, "manifest.json")
+        self.manifest: Dict[str, Dict] = {}
+        self.file_hashes: Dict[str, str] = {}
+        self.loaded_files: Set[str] = set()
+        
+        # LRU of retrieval results; the generation is bumped whenever the index changes
+        self.retrieval_cache: OrderedDict[str, List[RelevantDoc]] = OrderedDict()
+        self.retrieval_cache_lock = threading.Lock()
+        self.index_generation = 0
+        
+        # Answers reused for near-duplicate questions (only asked without conversation history)
+        self.enable_semantic_cache = SEMANTIC_CACHE_ENABLED
+        self.semantic_cache = SemanticCache()
+        
         # Ensure directories exist
         os.makedirs(documents_path, exist_ok=True)
         os.makedirs(db_path, exist_ok=True)
         
         print(f"🤖 RAG System initialized with model: {model_name}")
+        print(f"🔢 Embedding model: {embedding_model_name} (faster than embedding with the LLM, slightly lower retrieval accuracy)")
+    
+    def ensure_embedding_model(self):
+        """Pull the embedding model into Ollama if it isn't installed yet"""
+        base_url = self.embeddings.base_url
+        try:
+            response = ollama_session.get(f"{base_url}/api/tags", timeout=5)
+            response.raise_for_status()
+            installed = {model["name"] for model in orjson.loads(response.content).get("models", [])}
+            if self.embedding_model_name in installed or f"{self.embedding_model_name}:latest" in installed:
+                return
+            
+            print(f"📥 Pulling embedding model {self.embedding_model_name}...")
+            response = ollama_session.post(
+                f"{base_url}/api/pull",
+                json={"model": self.embedding_model_name, "stream": False},
+                timeout=1800
+            )
+            response.raise_for_status()
+            print(f"✅ Embedding model {self.embedding_model_name} ready")
+        except Exception as e:
+            print(f"⚠️  Could not pull embedding model {self.embedding_model_name}: {str(e)}")
+    
+    def load_manifest(self) -> Dict[str, Dict]:
+        """
+        Read the indexed-files manifest persisted next to the vector database
+        Returns {} if the index was built with a different embedding model (forces a rebuild)
+        """
+        try:
+            with open(self.manifest_path, "rb") as f:
+                data = orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return {}
+        
+        if data.get("embedding_model") != self.embedding_model_name:
+            print("⚠️  Vector database was built with a different embedding model, rebuilding")
+            return {}
+        return data["files"]
+    
+    def save_manifest(self):
+        """Persist the indexed-files manifest, tagged with the embedding model"""
+        os.makedirs(self.db_path, exist_ok=True)
+        with open(self.manifest_path, "wb") as f:
+            f.write(orjson.dumps({"embedding_model": self.embedding_model_name, "files": self.manifest}))
+    
+    def clear_index(self):
+        """Forget the in-memory index (call after deleting the database folder)"""
+        self.vectorstore = None
+        self.documents = []
+        self.manifest = {}
+        self.file_hashes = {}
+        self.loaded_files = set()
+        self.invalidate_retrieval_cache()
+    
+    def invalidate_retrieval_cache(self):
+        """Drop cached retrieval results and answers (call whenever the vectorstore changes)"""
+        with self.retrieval_cache_lock:
+            self.index_generation += 1
+            self.retrieval_cache.clear()
+        self.semantic_cache.clear()
     
     def load_documents(self) -> List[Document]:
-        """Load all documents from the documents directory"""
+        """Load new or changed documents (files already in the manifest with the same hash are skipped)"""
         documents = []
         
         print(f"📂 Loading documents from {self.documents_path}...")
         
+        # Only trust the manifest if its embeddings are actually loaded
+        indexed = self.manifest if self.vectorstore is not None else {}
+        
         # Get all files in documents directory
+        filepaths = []
+        self.file_hashes = {}
         for filename in os.listdir(self.documents_path):
             if filename.startswith('.'):
                 continue
                 
             filepath = os.path.join(self.documents_path, filename)
             
-            if not os.path.isfile(filepath):
-                continue
-            
-            try:
-                # Determine loader based on file extension
-                ext = os.path.splitext(filename)[1].lower()
-                
-                if ext == '.pdf':
-                    loader = PyPDFLoader(filepath)
-                    docs = loader.load()
-                    print(f"  ✅ PDF: {filename} ({len(docs)} pages)")
-                    
-                elif ext == '.txt':
-                    loader = TextLoader(filepath)
-                    docs = loader.load()
-                    print(f"  ✅ Text: {filename}")
-                    
-                elif ext == '.docx':
-                    loader = Docx2txtLoader(filepath)
-                    docs = loader.load()
-                    print(f"  ✅ Word: {filename}")
-                    
-                elif ext in ['.xlsx', '.xls']:
-                    try:
-                        loader = UnstructuredExcelLoader(filepath)
-                        docs = loader.load()
-                        print(f"  ✅ Excel: {filename}")
-                    except Exception as e:
-                        # Fallback to pandas
-                        import pandas as pd
-                        df = pd.read_excel(filepath)
-                        content = df.to_string()
-                        docs = [Document(page_content=content, metadata={"source": filename})]
-                        print(f"  ✅ Excel (pandas): {filename}")
-                    
-                elif ext == '.csv':
-                    loader = CSVLoader(filepath)
-                    docs = loader.load()
-                    print(f"  ✅ CSV: {filename}")
-                    
-                elif ext == '.md':
-                    loader = UnstructuredMarkdownLoader(filepath)
-                    docs = loader.load()
-                    print(f"  ✅ Markdown: {filename}")
-                    
-                elif ext in ['.html', '.htm']:
-                    loader = UnstructuredHTMLLoader(filepath)
-                    docs = loader.load()
-                    print(f"  ✅ HTML: {filename}")
-                    
-                elif ext in ['.pptx', '.ppt']:
-                    loader = UnstructuredPowerPointLoader(filepath)
-                    docs = loader.load()
-                    print(f"  ✅ PowerPoint: {filename}")
-                    
-                else:
+            if os.path.isfile(filepath):
+                # Reject unsupported types before paying to hash them
+                if os.path.splitext(filename)[1].lower() not in EXT_TO_LOADER:
                     print(f"  ⚠️  Unsupported: {filename}")
                     continue
                 
-                # Add filename to metadata
-                for doc in docs:
-                    doc.metadata['filename'] = filename
+                file_hash = hash_file(filepath)
+                self.file_hashes[filename] = file_hash
                 
-                documents.extend(docs)
+                if indexed.get(filename, {}).get("hash") == file_hash:
+                    print(f"  ⏭️  Unchanged: {filename}")
+                    continue
                 
-            except Exception as e:
-                print(f"  ❌ Error loading {filename}: {str(e)}")
-                continue
+                filepaths.append(filepath)
+        
+        # Parsing is CPU-bound, so spread files across workers; a handful of
+        # files isn't worth the worker start-up cost
+        self.loaded_files = set()
+        if len(filepaths) < PARALLEL_LOAD_MIN_FILES:
+            # Serial loading leaves the cores free, so large PDFs may split their pages across them
+            self.collect_loaded(documents, filepaths, map(functools.partial(load_file, pdf_workers=LOAD_WORKERS), filepaths))
+        else:
+            with LOAD_EXECUTOR(max_workers=min(LOAD_WORKERS, len(filepaths))) as executor:
+                self.collect_loaded(documents, filepaths, executor.map(load_file, filepaths, chunksize=4))
         
         self.documents = documents
-        print(f"\n✅ Loaded {len(documents)} document chunks from {len(set([d.metadata.get('filename', 'unknown') for d in documents]))} files")
+        print(f"\n✅ Loaded {len(documents)} document chunks from {len(self.loaded_files)} files")
         return documents
     
+    def collect_loaded(self, documents: List[Document], filepaths: List[str], results):
+        """Gather per-file loader results, recording loaded filenames and tagging file hashes"""
+        for filepath, docs in zip(filepaths, results):
+            if not docs:
+                continue
+            filename = os.path.basename(filepath)
+            self.loaded_files.add(filename)
+            # Tag chunks with their file's hash so the manifest can be rebuilt from them
+            file_hash = self.file_hashes[filename]
+            for doc in docs:
+                doc.metadata['file_hash'] = file_hash
+            documents.extend(docs)
+    
     def split_documents(self, documents: List[Document]) -> List[Document]:
         """Split documents into smaller chunks - IMPROVED for better retrieval"""
         print("✂️  Splitting documents into chunks...")
         
-        # IMPROVED: Smaller chunks with good overlap
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,      # Smaller for better precision
-            chunk_overlap=100,   # Good overlap for context
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
+        texts = [doc.page_content for doc in documents]
+        workers = min(os.cpu_count() or 1, len(documents))
+        if (workers > 1 and len(documents) >= PARALLEL_SPLIT_MIN_DOCS
+                and sum(map(len, texts)) >= PARALLEL_SPLIT_MIN_CHARS):
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                split_texts = list(executor.map(split_text, texts, chunksize=4))
+        else:
+            split_texts = map(split_text, texts)
         
-        chunks = text_splitter.split_documents(documents)
+        # Source previews are computed once here instead of on every query; everything
+        # else loaders attach (full paths, page totals, ...) is dropped before it's persisted
+        chunks = [
+            Document(page_content=text, metadata={**metadata, "preview": text[:200] + "..."})
+            for metadata, doc_texts in zip(map(chunk_metadata, documents), split_texts)
+            for text in doc_texts
+        ]
         
         print(f"✅ Created {len(chunks)} chunks")
         return chunks
     
     def create_vectorstore(self, chunks: List[Document]):
-        """Create vector database from document chunks"""
+        """
+        Create or update the vector database from document chunks
+        Embeddings of changed or deleted files are replaced; unchanged files are kept
+        """
         print("🔢 Creating vector database (this may take a few minutes)...")
         
-        # Create Chroma vectorstore with persistence
-        self.vectorstore = Chroma.from_documents(
-            documents=chunks,
-            embedding=self.embeddings,
-            persist_directory=self.db_path
-        )
+        # Keep manifest entries whose file is still present and unchanged
+        indexed = self.manifest if self.vectorstore is not None else {}
+        manifest = {
+            filename: entry for filename, entry in indexed.items()
+            if self.file_hashes.get(filename) == entry["hash"]
+        }
+        stale_ids = [
+            chunk_id
+            for filename, entry in indexed.items() if filename not in manifest
+            for chunk_id in entry["ids"]
+        ]
+        
+        ids = [uuid.uuid4().hex for _ in chunks]
+        for chunk, chunk_id in zip(chunks, ids):
+            entry = manifest.setdefault(
+                chunk.metadata['filename'],
+                {"hash": chunk.metadata['file_hash'], "ids": []}
+            )
+            entry["ids"].append(chunk_id)
+        
+        if stale_ids:
+            self.remove_embeddings(stale_ids)
+            print(f"🗑️  Removed {len(stale_ids)} outdated embeddings")
+        
+        # Embed and add in batches so memory stays bounded and progress is visible
+        for start in range(0, len(chunks), ADD_BATCH_SIZE):
+            batch = chunks[start:start + ADD_BATCH_SIZE]
+            texts = [chunk.page_content for chunk in batch]
+            vectors = self.embeddings.embed_documents(texts)
+            
+            if self.vectorstore is None:
+                # Create FAISS vectorstore
+                self.vectorstore = self.new_vectorstore(new_faiss_index(len(vectors[0]), len(chunks)))
+            
+            self.vectorstore.add_embeddings(
+                zip(texts, vectors),
+                metadatas=[chunk.metadata for chunk in batch],
+                ids=ids[start:start + ADD_BATCH_SIZE]
+            )
+            print(f"  📥 Indexed {min(start + ADD_BATCH_SIZE, len(chunks))}/{len(chunks)} chunks")
+        
+        if self.vectorstore is None:
+            return
+        
+        # Incremental adds can grow a flat index past the point where HNSW wins
+        index = self.vectorstore.index
+        if not isinstance(index, faiss.IndexHNSW) and index.ntotal >= HNSW_MIN_VECTORS:
+            print(f"🕸️  {index.ntotal} vectors: rebuilding as an HNSW index...")
+            self.rebuild_index(sorted(self.vectorstore.index_to_docstore_id.items()))
+        
+        self.invalidate_retrieval_cache()
         
-        print(f"✅ Vector database created with {len(chunks)} embeddings!")
+        # Persist index + docstore, then the manifest describing them
+        self.save_vectorstore()
+        self.manifest = manifest
+        self.save_manifest()
+        
+        print(f"✅ Vector database updated with {len(chunks)} new embeddings!")
         print(f"💾 Database saved to {self.db_path}")
     
+    def new_vectorstore(self, index: faiss.Index, docstore: InMemoryDocstore = None,
+                        index_to_docstore_id: Dict[int, str] = None) -> FAISS:
+        """Wrap a FAISS index as a vectorstore; embeddings are unit vectors, so inner product is cosine similarity"""
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore or InMemoryDocstore(),
+            index_to_docstore_id=index_to_docstore_id or {},
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+    
+    def remove_embeddings(self, ids: List[str]):
+        """Delete chunks by ID; HNSW graphs can't delete, so they are rebuilt from the stored vectors"""
+        store = self.vectorstore
+        if not isinstance(store.index, faiss.IndexHNSW):
+            store.delete(ids=ids)
+            return
+        
+        stale = set(ids)
+        self.rebuild_index([
+            (pos, doc_id) for pos, doc_id in sorted(store.index_to_docstore_id.items()) if doc_id not in stale
+        ])
+    
+    def rebuild_index(self, keep: List[tuple]):
+        """Rebuild the index from the stored vectors of the (position, doc id) pairs in keep"""
+        store = self.vectorstore
+        vectors = store.index.reconstruct_n(0, store.index.ntotal)[[pos for pos, _ in keep]]
+        
+        index = new_faiss_index(store.index.d, len(keep))
+        if keep:
+            index.add(vectors)
+        self.vectorstore = self.new_vectorstore(
+            index,
+            InMemoryDocstore({doc_id: store.docstore.search(doc_id) for _, doc_id in keep}),
+            {i: doc_id for i, (_, doc_id) in enumerate(keep)}
+        )
+    
     def initialize_from_documents(self, documents_path: str = None):
         """
         MAIN INITIALIZATION METHOD - Called by main.py
@@ -232,14 +1016,22 @@ class LocalRAGSystem:
         print("🚀 Initializing Local RAG System...")
         print("="*60 + "\n")
         
+        # Reuse the persisted index so only new or changed files get embedded
+        if self.vectorstore is None:
+            self.load_existing_db()
+        
+        if self.vectorstore is not None and not self.manifest:
+            # Index predates the manifest, so chunks can't be matched to files: rebuild
+            self.vectorstore = None
+        
         # Step 1: Load documents
         documents = self.load_documents()
         
-        if not documents:
+        if not self.file_hashes or (not documents and self.vectorstore is None):
             raise ValueError("No documents found to process! Please upload documents first.")
         
         # Step 2: Split into chunks
-        chunks = self.split_documents(documents)
+        chunks = self.split_documents(documents) if documents else []
         
         # Step 3: Create vector database
         self.create_vectorstore(chunks)
@@ -248,112 +1040,142 @@ class LocalRAGSystem:
         print("🎉 RAG System ready to answer questions!")
         print("="*60 + "\n")
         
+        documents_loaded = len(self.loaded_files)
         return {
-            "documents_loaded": len(set([d.metadata.get('filename', 'unknown') for d in documents])),
+            "documents_loaded": documents_loaded,
+            "documents_unchanged": len(self.file_hashes) - documents_loaded,
             "total_chunks": len(chunks),
             "status": "ready"
         }
     
-    def retrieve_relevant_docs(self, query: str, k: int = 5) -> List[Dict]:
-        """Retrieve relevant documents - IMPROVED to fetch more results"""
+    def retrieve_relevant_docs(self, query: str, k: int = 5, query_vec: List[float] = None) -> List[RelevantDoc]:
+        """
+        Retrieve relevant documents - IMPROVED to fetch more results (cached per query)
+        Pass query_vec when the query is already embedded to skip the Ollama round-trip
+        """
         if not self.vectorstore:
             return []
         
-        # IMPROVED: Fetch more documents for better coverage
-        results = self.vectorstore.similarity_search_with_score(query, k=k)
+        generation = self.index_generation
+        key = retrieval_cache_key(query, k, generation)
+        with self.retrieval_cache_lock:
+            cached = self.retrieval_cache.get(key)
+            if cached is not None:
+                self.retrieval_cache.move_to_end(key)
+                return cached
+        
+        if query_vec is None:
+            query_vec = self.embed_query_cached(query)
+        
+        # IMPROVED: Fetch more candidates, then pick k with MMR so near-duplicate
+        # chunks don't crowd out other relevant passages in the prompt
+        results = self.vectorstore.max_marginal_relevance_search_with_score_by_vector(
+            query_vec, k=k, fetch_k=max(4 * k, MMR_MIN_FETCH), lambda_mult=MMR_LAMBDA
+        )
         
         # Format results with scores
-        relevant_docs = []
-        for i, (doc, score) in enumerate(results):
-            relevant_docs.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "relevance_score": float(score),
-                "relevance_rank": i + 1
-            })
+        relevant_docs = [
+            RelevantDoc(doc.page_content, doc.metadata, float(score), i + 1)
+            for i, (doc, score) in enumerate(results)
+        ]
+        
+        with self.retrieval_cache_lock:
+            # Skip results computed against an index that changed mid-search
+            if generation == self.index_generation:
+                self.retrieval_cache[key] = relevant_docs
+                if len(self.retrieval_cache) > RETRIEVAL_CACHE_SIZE:
+                    self.retrieval_cache.popitem(last=False)
         
         return relevant_docs
     
-    def generate_answer(self, query: str, context_docs: List[Dict], conversation_history: List[Dict] = None) -> str:
-        """Generate answer - IMPROVED with stricter prompting"""
+    def build_prompt(self, query: str, context_docs: List[RelevantDoc], conversation_history: List[Dict] = None) -> str:
+        """
+        Build the answer prompt from retrieved context and recent history in one join
+        Everything is charged against PROMPT_TOKEN_BUDGET: instructions and question first,
+        then context (capped at max_context_tokens), then history from the newest turn back
+        """
+        buf = [PROMPT_INSTRUCTIONS]
+        append = buf.append
+        budget = PROMPT_TOKEN_BUDGET - estimate_tokens(
+            f"{PROMPT_INSTRUCTIONS}{PROMPT_QUESTION_PREFIX}{query}{PROMPT_ANSWER_CUE}"
+        )
         
-        # Prepare context
-        context = "\n\n".join([
-            f"[Document {doc['relevance_rank']} from {doc['metadata'].get('filename', 'unknown')}]:\n{doc['content']}"
-            for doc in context_docs
-        ])
+        # Context documents in rank order, separated by blank lines, up to the token budget
+        context_budget = min(self.max_context_tokens, budget)
+        used_tokens = 0
+        for i, doc in enumerate(context_docs):
+            entry = f"[Document {doc.relevance_rank} from {doc.metadata.get('filename', 'unknown')}]:\n{doc.content}"
+            tokens = estimate_tokens(entry)
+            if i and used_tokens + tokens > context_budget:
+                print(f"✂️  Context budget reached: dropped {len(context_docs) - i} of {len(context_docs)} documents")
+                break
+            used_tokens += tokens
+            if i:
+                append("\n\n")
+            append(entry)
+        append("\n")
+        budget -= used_tokens
         
-        # Prepare history
-        history_text = ""
-        if conversation_history and len(conversation_history) > 0:
-            history_text = "\n\nPrevious conversation:\n"
-            for turn in conversation_history[-3:]:
-                history_text += f"User: {turn['question']}\nAssistant: {turn['answer']}\n"
+        # Recent history, newest first, so the oldest turns are the ones left out
+        if conversation_history:
+            budget -= estimate_tokens(PROMPT_HISTORY_HEADER)
+            turns = []
+            for turn in reversed(conversation_history[-PROMPT_HISTORY_TURNS:]):
+                entry = f"User: {turn['question']}\nAssistant: {turn['answer']}\n"
+                tokens = estimate_tokens(entry)
+                if tokens > budget:
+                    break
+                budget -= tokens
+                turns.append(entry)
+            if turns:
+                append(PROMPT_HISTORY_HEADER)
+                buf.extend(reversed(turns))
         
-        # IMPROVED PROMPT: Strict instructions
-        prompt = f"""You are a helpful assistant. Answer the question using ONLY the information provided in the Context below.
-
-CRITICAL RULES:
-1. Use ONLY information from the Context documents below
-2. If the answer is not in the Context, say "I don't have that information in the provided documents"
-3. Do NOT use your general knowledge
-4. Do NOT make up information
-5. Cite the document source when possible
-
-Context from uploaded documents:
-{context}
-{history_text}
-
-Question: {query}
-
-Answer (based ONLY on Context above):"""
+        buf += (PROMPT_QUESTION_PREFIX, query, PROMPT_ANSWER_CUE)
+        return "".join(buf)
+    
+    async def generate_answer(self, query: str, context_docs: List[RelevantDoc], conversation_history: List[Dict] = None) -> str:
+        """Generate answer - IMPROVED with stricter prompting"""
+        prompt = self.build_prompt(query, context_docs, conversation_history)
         
         # Generate response
         print("🤖 Generating answer...")
-        answer = self.llm.generate(prompt)
+        answer = await self.llm.agenerate(prompt)
         
         return answer
     
-    def generate_answer_stream(self, query: str, context_docs: List[Dict], conversation_history: List[Dict] = None):
+    async def generate_answer_stream(self, query: str, context_docs: List[RelevantDoc], conversation_history: List[Dict] = None):
         """Generate answer with streaming - IMPROVED prompt"""
-        
-        # Prepare context
-        context = "\n\n".join([
-            f"[Document {doc['relevance_rank']} from {doc['metadata'].get('filename', 'unknown')}]:\n{doc['content']}"
-            for doc in context_docs
-        ])
-        
-        # Prepare history
-        history_text = ""
-        if conversation_history and len(conversation_history) > 0:
-            history_text = "\n\nPrevious conversation:\n"
-            for turn in conversation_history[-3:]:
-                history_text += f"User: {turn['question']}\nAssistant: {turn['answer']}\n"
-        
-        # IMPROVED PROMPT
-        prompt = f"""You are a helpful assistant. Answer the question using ONLY the information provided in the Context below.
-
-CRITICAL RULES:
-1. Use ONLY information from the Context documents below
-2. If the answer is not in the Context, say "I don't have that information in the provided documents"
-3. Do NOT use your general knowledge
-4. Do NOT make up information
-5. Cite the document source when possible
-
-Context from uploaded documents:
-{context}
-{history_text}
-
-Question: {query}
-
-Answer (based ONLY on Context above):"""
+        prompt = self.build_prompt(query, context_docs, conversation_history)
         
         # Stream response
-        for chunk in self.llm.generate_stream(prompt):
+        async for chunk in self.llm.agenerate_stream(prompt):
             yield chunk
     
-    def ask(self, query: str, conversation_history: List[Dict] = None) -> Dict:
-        """Main method to ask a question"""
+    async def run_blocking(self, func, *args, **kwargs):
+        """Run a blocking call on self.executor without stalling the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+    
+    async def recall_or_retrieve(self, query: str, conversation_history: List[Dict] = None):
+        """
+        Returns (cached result, None, None) on a semantic cache hit, otherwise
+        (None, relevant docs, query vector to cache the answer under or None)
+        """
+        # Follow-ups depend on the conversation, so only standalone questions use the cache
+        if not self.enable_semantic_cache or conversation_history:
+            return None, await self.run_blocking(self.retrieve_relevant_docs, query, k=10), None
+        
+        query_vec = await self.run_blocking(self.embed_query_cached, query)
+        cached = self.semantic_cache.get(query_vec)
+        if cached is not None:
+            print("⚡ Semantic cache hit")
+            return cached, None, None
+        
+        return None, await self.run_blocking(self.retrieve_relevant_docs, query, k=10, query_vec=query_vec), query_vec
+    
+    async def ask(self, query: str, conversation_history: List[Dict] = None) -> Dict:
+        """Main method to ask a question (retrieval runs on self.executor)"""
         if not self.vectorstore:
             return {
                 "error": "System not initialized. Please load documents first.",
@@ -364,7 +1186,9 @@ Answer (based ONLY on Context above):"""
         
         # IMPROVED: Retrieve more documents
         print("🔍 Searching for relevant information...")
-        relevant_docs = self.retrieve_relevant_docs(query, k=10)
+        cached, relevant_docs, query_vec = await self.recall_or_retrieve(query, conversation_history)
+        if cached is not None:
+            return {"question": query, "answer": cached["answer"], "sources": cached["sources"], "cache_hit": True}
         
         if not relevant_docs:
             return {
@@ -376,21 +1200,14 @@ Answer (based ONLY on Context above):"""
         print(f"📚 Found {len(relevant_docs)} relevant chunks")
         
         # Show which files (for debugging)
-        files_found = set([doc['metadata'].get('filename', 'unknown') for doc in relevant_docs])
+        files_found = {doc.metadata.get('filename', 'unknown') for doc in relevant_docs}
         print(f"📄 From files: {', '.join(files_found)}")
         
         # Generate answer
-        answer = self.generate_answer(query, relevant_docs, conversation_history)
+        answer = await self.generate_answer(query, relevant_docs, conversation_history)
         
         # Format sources
-        sources = [
-            {
-                "content_preview": doc["content"][:200] + "...",
-                "metadata": doc["metadata"],
-                "relevance_score": doc["relevance_score"]
-            }
-            for doc in relevant_docs
-        ]
+        sources = [doc.to_source() for doc in relevant_docs]
         
         result = {
             "question": query,
@@ -398,62 +1215,122 @@ Answer (based ONLY on Context above):"""
             "sources": sources
         }
         
+        if query_vec is not None and not answer.startswith("Error generating response"):
+            self.semantic_cache.put(query_vec, {"answer": result["answer"], "sources": sources})
+        
         print("✅ Answer generated!\n")
         return result
     
-    def ask_stream(self, query: str, conversation_history: List[Dict] = None):
-        """Ask a question and stream the response"""
+    async def ask_stream(self, query: str, conversation_history: List[Dict] = None):
+        """Ask a question and stream the response as event dicts (serialized by the caller)"""
         if not self.vectorstore:
-            yield json.dumps({"error": "System not initialized"})
+            yield {"error": "System not initialized"}
             return
         
-        # Retrieve documents
-        relevant_docs = self.retrieve_relevant_docs(query, k=10)
+        # Retrieve documents (embedding + search block, so run them off the event loop)
+        cached, relevant_docs, query_vec = await self.recall_or_retrieve(query, conversation_history)
+        if cached is not None:
+            yield {
+                "question": query,
+                "sources": cached["sources"],
+                "answer_chunk": cached["answer"],
+                "cache_hit": True,
+                "done": False
+            }
+            yield {"done": True}
+            return
         
         if not relevant_docs:
-            yield json.dumps({
+            yield {
                 "question": query,
                 "answer": "I couldn't find any relevant information.",
                 "sources": [],
                 "done": True
-            })
+            }
             return
         
         # Send sources first
-        sources = [
-            {
-                "content_preview": doc["content"][:200] + "...",
-                "metadata": doc["metadata"],
-                "relevance_score": doc["relevance_score"]
-            }
-            for doc in relevant_docs
-        ]
+        sources = [doc.to_source() for doc in relevant_docs]
         
-        yield json.dumps({
+        yield {
             "question": query,
             "sources": sources,
             "answer_chunk": "",
             "done": False
-        })
+        }
         
         # Stream the answer
-        for chunk in self.generate_answer_stream(query, relevant_docs, conversation_history):
-            yield json.dumps({
+        answer_parts = []
+        async for chunk in self.generate_answer_stream(query, relevant_docs, conversation_history):
+            answer_parts.append(chunk)
+            yield {
                 "answer_chunk": chunk,
                 "done": False
-            })
+            }
+        
+        answer = "".join(answer_parts)
+        if query_vec is not None and answer and not answer.startswith("Error generating response"):
+            self.semantic_cache.put(query_vec, {"answer": answer.strip(), "sources": sources})
         
         # Send completion
-        yield json.dumps({"done": True})
+        yield {"done": True}
+    
+    def save_vectorstore(self):
+        """Write the FAISS index plus a JSON sidecar of chunk texts/metadata in index order"""
+        store = self.vectorstore
+        faiss.write_index(store.index, os.path.join(self.db_path, "index.faiss"))
+        
+        ids = [store.index_to_docstore_id[i] for i in range(store.index.ntotal)]
+        documents = [store.docstore.search(doc_id) for doc_id in ids]
+        with open(os.path.join(self.db_path, "docstore.json"), "wb") as f:
+            f.write(orjson.dumps({
+                "ids": ids,
+                "documents": [[doc.page_content, doc.metadata] for doc in documents]
+            }))
+        
+        # Drop the pickle docstore written by older versions; docstore.json supersedes it
+        legacy_path = os.path.join(self.db_path, "index.pkl")
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
     
     def load_existing_db(self):
         """Load existing vector database if it exists"""
-        if os.path.exists(self.db_path) and os.listdir(self.db_path):
+        index_path = os.path.join(self.db_path, "index.faiss")
+        docstore_path = os.path.join(self.db_path, "docstore.json")
+        if os.path.exists(index_path) and os.path.exists(docstore_path):
             print("📂 Loading existing vector database...")
-            self.vectorstore = Chroma(
-                persist_directory=self.db_path,
-                embedding_function=self.embeddings
+            with open(docstore_path, "rb") as f:
+                data = orjson.loads(f.read())
+            self.vectorstore = self.new_vectorstore(
+                faiss.read_index(index_path),
+                InMemoryDocstore({
+                    doc_id: Document(page_content=content, metadata=metadata)
+                    for doc_id, (content, metadata) in zip(data["ids"], data["documents"])
+                }),
+                dict(enumerate(data["ids"]))
+            )
+        elif os.path.exists(index_path) and os.path.exists(os.path.join(self.db_path, "index.pkl")):
+            print("📂 Loading existing vector database (legacy format)...")
+            # The docstore pickle was written by an older version of this class, so it's trusted
+            self.vectorstore = FAISS.load_local(
+                self.db_path,
+                self.embeddings,
+                allow_dangerous_deserialization=True,
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
             )
-            print("✅ Existing database loaded!")
-            return True
-        return False
+        else:
+            return False
+        
+        if not has_unit_range(self.vectorstore.index):
+            # Older indexes learned the int8 range from their first batch, so later
+            # additions were clipped; their stored vectors can't be recovered, so re-embed
+            print("⚠️  Vector database was quantized with a data-dependent range, rebuilding")
+            self.vectorstore = None
+            return False
+        
+        if isinstance(self.vectorstore.index, faiss.IndexHNSW):
+            self.vectorstore.index.hnsw.efSearch = HNSW_EF_SEARCH
+        self.manifest = self.load_manifest()
+        self.invalidate_retrieval_cache()
+        print("✅ Existing database loaded!")
+        return True
@@ -0,0 +1,16 @@
+"""
+Sample questions shared by the test scripts
+Reusing the exact same text lets repeat runs hit the server's retrieval cache
+"""
+
+QUESTIONS = [
+    "What is RAG and how does it work?",
+    "Compare the different AI models available (Llama 2, Mistral, Phi)",
+    "What products are available in the electronics category and what are their prices?",
+    "What are the benefits of using local RAG systems?",
+    "Which AI model should I use if I have limited RAM?",
+    "Tell me about the technical details of RAG implementation",
+]
+
+# Asked by test_streaming's comparison; test_enhanced_api.py asks it in TEST 7 first
+COMPARE_QUESTION = QUESTIONS[-1]
@@ -5,13 +5,36 @@ Beautiful, easy-to-use chat interface with streaming support
 
 import streamlit as st
 import requests
-import json
+from requests.adapters import HTTPAdapter
+import orjson
 import time
 from datetime import datetime
 
 # Configuration
 API_BASE = "http://localhost:8000"
 
+# Redraw the streaming answer at most every 50 ms or 16 chunks, not once per token
+STREAM_FLUSH_SECONDS = 0.05
+STREAM_FLUSH_CHUNKS = 16
+
+@st.cache_resource
+def get_http():
+    """One keep-alive HTTP session for all API calls, shared across reruns"""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+    return session
+
+
+@st.cache_data(ttl=5)
+def probe_health():
+    """(status code, health JSON) from the API, or None if unreachable; cached 5 s so reruns don't each hit /health"""
+    try:
+        response = get_http().get(f"{API_BASE}/health", timeout=2)
+    except requests.exceptions.RequestException:
+        return None
+    return response.status_code, (response.json() if response.status_code == 200 else None)
+
+
 # Page config
 st.set_page_config(
     page_title="RAG Chat Assistant",
@@ -87,21 +110,20 @@ with st.sidebar:
     st.markdown("---")
     
     # Status check
-    try:
-        response = requests.get(f"{API_BASE}/health", timeout=2)
-        if response.status_code == 200:
-            health = response.json()
-            st.markdown("### Status")
-            st.markdown(f"<span class='status-connected'>🟢 Connected</span>", unsafe_allow_html=True)
-            st.info(f"📚 Documents: {health['documents_count']}")
-            
-            if st.session_state.session_id:
-                st.success(f"Session: {st.session_state.session_id[:8]}...")
-        else:
-            st.markdown("<span class='status-error'>🔴 Server Error</span>", unsafe_allow_html=True)
-    except:
+    probe = probe_health()
+    if probe is None:
         st.markdown("<span class='status-error'>🔴 Disconnected</span>", unsafe_allow_html=True)
         st.error("Cannot connect to server at http://localhost:8000")
+    elif probe[0] == 200:
+        health = probe[1]
+        st.markdown("### Status")
+        st.markdown(f"<span class='status-connected'>🟢 Connected</span>", unsafe_allow_html=True)
+        st.info(f"📚 Documents: {health['documents_count']}")
+        
+        if st.session_state.session_id:
+            st.success(f"Session: {st.session_state.session_id[:8]}...")
+    else:
+        st.markdown("<span class='status-error'>🔴 Server Error</span>", unsafe_allow_html=True)
     
     st.markdown("---")
     
@@ -129,7 +151,7 @@ with st.sidebar:
     if st.button("📜 View History", use_container_width=True):
         if st.session_state.session_id:
             try:
-                response = requests.get(f"{API_BASE}/conversations/{st.session_state.session_id}")
+                response = get_http().get(f"{API_BASE}/conversations/{st.session_state.session_id}")
                 if response.status_code == 200:
                     history = response.json()
                     st.session_state.conversation_history = history['conversations']
@@ -199,7 +221,8 @@ if question:
         try:
             if use_streaming:
                 # Streaming response
-                response = requests.post(
+                # Closed on exit, so breaking out at the done event still releases the connection
+                with get_http().post(
                     f"{API_BASE}/ask/stream",
                     json={
                         "question": question,
@@ -207,59 +230,68 @@ if question:
                     },
                     stream=True,
                     timeout=120
-                )
-                
-                if response.status_code == 200:
-                    # Get session ID
-                    if not st.session_state.session_id and 'X-Session-ID' in response.headers:
-                        st.session_state.session_id = response.headers['X-Session-ID']
-                    
-                    full_answer = ""
-                    sources = []
-                    
-                    # Create a placeholder for streaming
-                    message_placeholder = st.empty()
+                ) as response:
                     
-                    for line in response.iter_lines():
-                        if line:
-                            line = line.decode('utf-8')
-                            if line.startswith('data: '):
+                    if response.status_code == 200:
+                        # Get session ID
+                        if not st.session_state.session_id:
+                            st.session_state.session_id = response.headers.get('X-Session-ID')
+                        
+                        answer_parts = []
+                        sources = []
+                        
+                        # Create a placeholder for streaming
+                        message_placeholder = st.empty()
+                        
+                        def render_answer(text):
+                            """Update placeholder with current answer as plain markdown; the styled
+                            bubble is rendered once from the message history after the rerun"""
+                            message_placeholder.markdown(text + "▌")
+                        
+                        last_flush = time.monotonic()
+                        pending = 0
+                        
+                        for line in response.iter_lines():
+                            if line.startswith(b'data: '):
                                 try:
-                                    data = json.loads(line[6:])
+                                    data = orjson.loads(line[6:])
+                                except orjson.JSONDecodeError:
+                                    continue
+                                
+                                if data.get('sources'):
+                                    sources = data['sources']
+                                
+                                if data.get('answer_chunk'):
+                                    answer_parts.append(data['answer_chunk'])
+                                    pending += 1
                                     
-                                    if 'sources' in data and data['sources']:
-                                        sources = data['sources']
-                                    
-                                    if 'answer_chunk' in data and data['answer_chunk']:
-                                        full_answer += data['answer_chunk']
-                                        
-                                        # Update placeholder with current answer
-                                        message_placeholder.markdown(f"""
-                                        <div class='chat-message assistant-message'>
-                                            <div><strong>🤖 Assistant</strong></div>
-                                            <div style='margin-top: 0.5rem;'>{full_answer}▌</div>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                                    
-                                    if data.get('done', False):
-                                        break
-                                except:
-                                    pass
-                    
-                    # Add final message
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": full_answer,
-                        "sources": len(sources)
-                    })
-                    
-                    message_placeholder.empty()
-                else:
-                    st.error(f"Error: {response.status_code}")
+                                    now = time.monotonic()
+                                    if pending >= STREAM_FLUSH_CHUNKS or now - last_flush >= STREAM_FLUSH_SECONDS:
+                                        render_answer("".join(answer_parts))
+                                        last_flush = now
+                                        pending = 0
+                                
+                                if data.get('done', False):
+                                    break
+                        
+                        full_answer = "".join(answer_parts)
+                        if pending:
+                            render_answer(full_answer)
+                        
+                        # Add final message
+                        st.session_state.messages.append({
+                            "role": "assistant",
+                            "content": full_answer,
+                            "sources": len(sources)
+                        })
+                        
+                        message_placeholder.empty()
+                    else:
+                        st.error(f"Error: {response.status_code}")
             
             else:
                 # Standard response (non-streaming)
-                response = requests.post(
+                response = get_http().post(
                     f"{API_BASE}/ask",
                     json={
                         "question": question,
@@ -1,9 +1,20 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
-import time
+import orjson
+
+try:
+    # Streams multipart bodies from the open file instead of building them in memory
+    from requests_toolbelt.multipart.encoder import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
 
 BASE_URL = "http://localhost:8000"
 
+# One keep-alive session so sequential calls reuse the same connection
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+
 def print_section(title):
     print("\n" + "="*60)
     print(f"  {title}")
@@ -11,23 +22,27 @@ def print_section(title):
 
 # 1. Check health
 print_section("1. Checking System Health")
-response = requests.get(f"{BASE_URL}/health")
-print(json.dumps(response.json(), indent=2))
+response = SESSION.get(f"{BASE_URL}/health")
+print(json.dumps(orjson.loads(response.content), indent=2))
 
 # 2. Upload a file (if you have one)
 print_section("2. Uploading Document")
 try:
     with open("documents/ai_basics.txt", "rb") as f:
         files = {"file": ("ai_basics.txt", f, "text/plain")}
-        response = requests.post(f"{BASE_URL}/upload", files=files)
-        print(json.dumps(response.json(), indent=2))
+        if MultipartEncoder is not None:
+            encoder = MultipartEncoder(fields=files)
+            response = SESSION.post(f"{BASE_URL}/upload", data=encoder, headers={"Content-Type": encoder.content_type})
+        else:
+            response = SESSION.post(f"{BASE_URL}/upload", files=files)
+        print(json.dumps(orjson.loads(response.content), indent=2))
 except FileNotFoundError:
     print("⚠️  File not found. Make sure documents/ai_basics.txt exists")
 
 # 3. Initialize system
 print_section("3. Initializing System (this will take a few minutes)")
-response = requests.post(f"{BASE_URL}/initialize")
-print(json.dumps(response.json(), indent=2))
+response = SESSION.post(f"{BASE_URL}/initialize")
+print(json.dumps(orjson.loads(response.content), indent=2))
 
 # 4. Ask questions
 print_section("4. Asking Questions")
@@ -42,18 +57,16 @@ for question in questions:
     print(f"\n❓ Question: {question}")
     print("🤔 Thinking...\n")
     
-    response = requests.post(
+    response = SESSION.post(
         f"{BASE_URL}/ask",
         json={"question": question}
     )
     
     if response.status_code == 200:
-        result = response.json()
+        result = orjson.loads(response.content)
         print(f"✅ Answer:\n{result['answer']}\n")
         print(f"📚 Sources: {len(result['sources'])} documents used")
     else:
         print(f"❌ Error: {response.text}")
-    
-    time.sleep(2)  # Wait between questions
 
 print_section("✅ Testing Complete!")
\ No newline at end of file
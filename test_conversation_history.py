@@ -4,16 +4,32 @@ Demonstrates multi-turn conversations with context retention
 """
 
 import requests
-import json
-import time
+from requests.adapters import HTTPAdapter
+import re
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+
+from client_helpers import JSON_HEADERS, ask_body, ask_streaming, preview
 
 BASE_URL = "http://localhost:8000"
 
+# Keywords showing a follow-up answer used the earlier turn; whole words only,
+# so "it" doesn't match inside "with"
+CONTEXT_INDICATORS = ("mistral", "it", "faster", "compared", "speed")
+CONTEXT_INDICATOR_RE = re.compile(r"\b(" + "|".join(CONTEXT_INDICATORS) + r")\b", re.IGNORECASE)
+
+# Section separators, built once
+HEAVY_RULE = "=" * 70
+LIGHT_RULE = "─" * 70
+DOUBLE_RULE = "═" * 70
+
+# One keep-alive session so sequential calls reuse the same connection
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+
 def print_section(title):
     """Print formatted section header"""
-    print("\n" + "="*70)
-    print(f"  {title}")
-    print("="*70 + "\n")
+    print(f"\n{HEAVY_RULE}\n  {title}\n{HEAVY_RULE}\n")
 
 def test_single_conversation():
     """Test conversation with history retention"""
@@ -31,26 +47,15 @@ def test_single_conversation():
     session_id = None
     
     for i, question in enumerate(questions, 1):
-        print(f"\n{'─'*70}")
+        print(f"\n{LIGHT_RULE}")
         print(f"Turn {i}/{len(questions)}")
-        print('─'*70)
+        print(LIGHT_RULE)
         print(f"❓ User: {question}")
         
-        # Prepare request (include session_id after first question)
-        request_data = {"question": question}
-        if session_id:
-            request_data["session_id"] = session_id
-        
-        # Make request
-        response = requests.post(
-            f"{BASE_URL}/ask",
-            json=request_data,
-            timeout=120
-        )
+        # Stream the answer (include session_id after first question)
+        result = ask_streaming(SESSION, BASE_URL, question, session_id)
         
-        if response.status_code == 200:
-            result = response.json()
-            
+        if result:
             # Get session_id from first response
             if not session_id:
                 session_id = result.get("session_id")
@@ -59,13 +64,41 @@ def test_single_conversation():
             print(f"\n🤖 Assistant: {result['answer']}")
             print(f"\n📚 Sources: {len(result['sources'])} documents")
         else:
-            print(f"❌ Error: {response.text}")
             return None
-        
-        time.sleep(1)
     
     return session_id
 
+def run_conversation(topic, questions):
+    """Ask one topic's questions in order on a shared session; returns (session_id, output lines)"""
+    lines = [f"\n{DOUBLE_RULE}", f"  Conversation about: {topic}", DOUBLE_RULE]
+    session_id = None
+    
+    for i, question in enumerate(questions, 1):
+        lines.append(f"\n❓ Question {i}: {question}")
+        
+        body = ask_body(question, session_id)
+        
+        response = SESSION.post(
+            f"{BASE_URL}/ask",
+            data=body,
+            headers=JSON_HEADERS,
+            timeout=120
+        )
+        
+        if response.status_code == 200:
+            result = orjson.loads(response.content)
+            
+            if not session_id:
+                session_id = result.get("session_id")
+                lines.append(f"📝 Session ID: {session_id}")
+            
+            # Show abbreviated answer
+            lines.append(f"🤖 Answer: {preview(result['answer'])}")
+        else:
+            lines.append(f"❌ Error: {response.text}")
+    
+    return session_id, lines
+
 def test_multiple_conversations():
     """Test multiple independent conversations"""
     
@@ -84,46 +117,18 @@ def test_multiple_conversations():
         ]
     }
     
+    # The conversations don't share a session, so they run side by side over
+    # the pooled connections; each one's output is printed as a block
     session_ids = {}
-    
-    for topic, questions in conversations.items():
-        print(f"\n{'═'*70}")
-        print(f"  Conversation about: {topic}")
-        print('═'*70)
-        
-        session_id = None
-        
-        for i, question in enumerate(questions, 1):
-            print(f"\n❓ Question {i}: {question}")
-            
-            request_data = {"question": question}
-            if session_id:
-                request_data["session_id"] = session_id
-            
-            response = requests.post(
-                f"{BASE_URL}/ask",
-                json=request_data,
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                
-                if not session_id:
-                    session_id = result.get("session_id")
-                    print(f"📝 Session ID: {session_id}")
-                
-                # Show abbreviated answer
-                answer = result['answer']
-                if len(answer) > 200:
-                    answer = answer[:200] + "..."
-                print(f"🤖 Answer: {answer}")
-            else:
-                print(f"❌ Error: {response.text}")
-            
-            time.sleep(1)
-        
-        session_ids[topic] = session_id
+    with ThreadPoolExecutor(max_workers=len(conversations)) as executor:
+        futures = {
+            topic: executor.submit(run_conversation, topic, questions)
+            for topic, questions in conversations.items()
+        }
+        for topic, future in futures.items():
+            session_id, lines = future.result()
+            print("\n".join(lines))
+            session_ids[topic] = session_id
     
     return session_ids
 
@@ -138,13 +143,13 @@ def test_conversation_history_retrieval(session_id):
     
     print(f"📝 Retrieving history for session: {session_id}\n")
     
-    response = requests.get(f"{BASE_URL}/conversations/{session_id}")
+    response = SESSION.get(f"{BASE_URL}/conversations/{session_id}")
     
     if response.status_code == 200:
-        history = response.json()
+        history = orjson.loads(response.content)
         
         print(f"✅ Found {history['conversation_count']} conversations\n")
-        print("─"*70)
+        print(LIGHT_RULE)
         
         for i, conv in enumerate(history['conversations'], 1):
             print(f"\nTurn {i}:")
@@ -153,7 +158,7 @@ def test_conversation_history_retrieval(session_id):
             print(f"⏰ Time: {conv['timestamp']}")
             print(f"📚 Sources: {len(conv['sources'])}")
         
-        print("\n" + "─"*70)
+        print("\n" + LIGHT_RULE)
     else:
         print(f"❌ Error: {response.text}")
 
@@ -162,22 +167,22 @@ def test_list_all_sessions():
     
     print_section("📋 ALL ACTIVE SESSIONS")
     
-    response = requests.get(f"{BASE_URL}/conversations")
+    response = SESSION.get(f"{BASE_URL}/conversations")
     
     if response.status_code == 200:
-        data = response.json()
+        data = orjson.loads(response.content)
         
         print(f"📊 Total active sessions: {data['active_sessions']}\n")
         
         if data['sessions']:
-            print("─"*70)
+            print(LIGHT_RULE)
             for i, session in enumerate(data['sessions'], 1):
                 print(f"\nSession {i}:")
                 print(f"   ID: {session['session_id']}")
                 print(f"   Conversations: {session['conversation_count']}")
                 print(f"   Last updated: {session['last_updated']}")
                 print(f"   Started with: {session['first_question']}")
-            print("\n" + "─"*70)
+            print("\n" + LIGHT_RULE)
         else:
             print("ℹ️  No active sessions found")
     else:
@@ -189,13 +194,14 @@ def test_conversation_context():
     print_section("🎯 CONTEXT AWARENESS TEST")
     
     print("This test verifies the AI uses previous conversation context")
-    print("─"*70 + "\n")
+    print(LIGHT_RULE + "\n")
     
     # First, ask about something specific
     print("❓ Question 1: Tell me about Mistral AI model")
-    response1 = requests.post(
+    response1 = SESSION.post(
         f"{BASE_URL}/ask",
-        json={"question": "Tell me about Mistral AI model"},
+        data=ask_body("Tell me about Mistral AI model"),
+        headers=JSON_HEADERS,
         timeout=120
     )
     
@@ -203,43 +209,36 @@ def test_conversation_context():
         print(f"❌ Error: {response1.text}")
         return
     
-    result1 = response1.json()
+    result1 = orjson.loads(response1.content)
     session_id = result1.get("session_id")
     
-    answer1 = result1['answer']
-    if len(answer1) > 150:
-        answer1 = answer1[:150] + "..."
-    print(f"🤖 Answer: {answer1}\n")
+    print(f"🤖 Answer: {preview(result1['answer'], 150)}\n")
     print(f"📝 Session ID: {session_id}\n")
     
-    time.sleep(2)
-    
     # Now ask a follow-up that requires context
     print("❓ Question 2: How fast is it compared to Llama 2?")
     print("   (Note: 'it' should refer to Mistral from previous question)\n")
     
-    response2 = requests.post(
+    response2 = SESSION.post(
         f"{BASE_URL}/ask",
-        json={
-            "question": "How fast is it compared to Llama 2?",
-            "session_id": session_id
-        },
+        data=ask_body("How fast is it compared to Llama 2?", session_id),
+        headers=JSON_HEADERS,
         timeout=120
     )
     
     if response2.status_code == 200:
-        result2 = response2.json()
+        result2 = orjson.loads(response2.content)
         answer2 = result2['answer']
         
         print(f"🤖 Answer: {answer2}\n")
         
         # Check if answer makes sense in context
-        print("─"*70)
+        print(LIGHT_RULE)
         print("🔍 Context Check:")
         
-        # Look for keywords that would indicate context understanding
-        context_indicators = ["mistral", "it", "faster", "compared", "speed"]
-        found_indicators = [word for word in context_indicators if word.lower() in answer2.lower()]
+        # Look for keywords that would indicate context understanding (one regex pass)
+        found = {match.group(1).lower() for match in CONTEXT_INDICATOR_RE.finditer(answer2)}
+        found_indicators = [word for word in CONTEXT_INDICATORS if word in found]
         
         if found_indicators:
             print(f"   ✅ Answer appears contextually aware")
@@ -247,7 +246,7 @@ def test_conversation_context():
         else:
             print(f"   ⚠️  Answer may not be using previous context")
         
-        print("─"*70)
+        print(LIGHT_RULE)
     else:
         print(f"❌ Error: {response2.text}")
 
@@ -263,20 +262,20 @@ def test_clear_conversation(session_id):
     print(f"📝 Clearing history for session: {session_id}\n")
     
     # First, show current history
-    response = requests.get(f"{BASE_URL}/conversations/{session_id}")
+    response = SESSION.get(f"{BASE_URL}/conversations/{session_id}")
     if response.status_code == 200:
-        history = response.json()
+        history = orjson.loads(response.content)
         print(f"📊 Current conversation count: {history['conversation_count']}")
     
     # Clear the history
-    response = requests.delete(f"{BASE_URL}/conversations/{session_id}")
+    response = SESSION.delete(f"{BASE_URL}/conversations/{session_id}")
     
     if response.status_code == 200:
-        result = response.json()
+        result = orjson.loads(response.content)
         print(f"✅ {result['message']}")
         
         # Verify it's cleared
-        response = requests.get(f"{BASE_URL}/conversations/{session_id}")
+        response = SESSION.get(f"{BASE_URL}/conversations/{session_id}")
         if response.status_code == 404:
             print("✅ Confirmed: Session history has been deleted")
         else:
@@ -290,23 +289,23 @@ def test_clear_all_conversations():
     print_section("🗑️ CLEAR ALL CONVERSATIONS TEST")
     
     # First, show current sessions
-    response = requests.get(f"{BASE_URL}/conversations")
+    response = SESSION.get(f"{BASE_URL}/conversations")
     if response.status_code == 200:
-        data = response.json()
+        data = orjson.loads(response.content)
         print(f"📊 Current active sessions: {data['active_sessions']}")
     
     # Clear all
-    response = requests.delete(f"{BASE_URL}/conversations")
+    response = SESSION.delete(f"{BASE_URL}/conversations")
     
     if response.status_code == 200:
-        result = response.json()
+        result = orjson.loads(response.content)
         print(f"✅ {result['message']}")
         print(f"📊 Sessions cleared: {result['sessions_cleared']}")
         
         # Verify
-        response = requests.get(f"{BASE_URL}/conversations")
+        response = SESSION.get(f"{BASE_URL}/conversations")
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             if data['active_sessions'] == 0:
                 print("✅ Confirmed: All sessions cleared")
             else:
@@ -317,16 +316,16 @@ def test_clear_all_conversations():
 def main():
     """Run all conversation history tests"""
     
-    print("\n" + "="*70)
+    print("\n" + HEAVY_RULE)
     print("  💬 CONVERSATION HISTORY TESTS")
     print("  Testing multi-turn conversations with context retention")
-    print("="*70)
+    print(HEAVY_RULE)
     
     # Check if system is ready
     try:
-        response = requests.get(f"{BASE_URL}/health")
+        response = SESSION.get(f"{BASE_URL}/health")
         if response.status_code == 200:
-            health = response.json()
+            health = orjson.loads(response.content)
             if not health["system_ready"]:
                 print("\n❌ System not initialized!")
                 print("   Please run: POST /initialize first")
@@ -343,29 +342,23 @@ def main():
     try:
         # Test 1: Single conversation
         session_id = test_single_conversation()
-        time.sleep(2)
         
         # Test 2: Multiple conversations
         session_ids = test_multiple_conversations()
-        time.sleep(2)
         
         # Test 3: Retrieve history
         if session_id:
             test_conversation_history_retrieval(session_id)
-            time.sleep(2)
         
         # Test 4: List all sessions
         test_list_all_sessions()
-        time.sleep(2)
         
         # Test 5: Context awareness
         test_conversation_context()
-        time.sleep(2)
         
         # Test 6: Clear single conversation
         if session_id:
             test_clear_conversation(session_id)
-            time.sleep(2)
         
         # Test 7: Clear all conversations
         test_clear_all_conversations()
@@ -380,9 +373,9 @@ def main():
         return
     
     # Summary
-    print("\n" + "="*70)
+    print("\n" + HEAVY_RULE)
     print("  ✅ ALL CONVERSATION HISTORY TESTS COMPLETED!")
-    print("="*70)
+    print(HEAVY_RULE)
     print("\n🎯 Features Tested:")
     print("   ✅ Multi-turn conversations with context")
     print("   ✅ Multiple independent sessions")
@@ -4,12 +4,37 @@ Tests document upload, initialization, and querying
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
-import time
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from sample_questions import QUESTIONS
+
+try:
+    # Streams multipart bodies from the open file instead of building them in memory
+    from requests_toolbelt.multipart.encoder import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
 
 BASE_URL = "http://localhost:8000"
 
+# (connect, read) timeouts; the short connect timeout fails fast when the server is down
+CONNECT_TIMEOUT = 2
+REQUEST_TIMEOUT = (CONNECT_TIMEOUT, 120)
+
+# How many /ask requests TEST 7 keeps in flight at once
+ASK_CONCURRENCY = 4
+
+# VERBOSE=0 swaps the pretty-printed JSON dumps for a one-line status (for CI/headless runs)
+VERBOSE = os.environ.get("VERBOSE", "1") == "1"
+
+# One keep-alive session so sequential calls reuse the same connection
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+
 def print_section(title):
     """Print a formatted section header"""
     print("\n" + "="*70)
@@ -18,29 +43,75 @@ def print_section(title):
 
 def print_response(response, show_full=False):
     """Print API response in formatted JSON"""
-    if response.status_code == 200:
-        data = response.json()
-        if show_full:
-            print(json.dumps(data, indent=2))
-        else:
-            print(json.dumps(data, indent=2)[:500] + "..." if len(json.dumps(data)) > 500 else json.dumps(data, indent=2))
+    if not VERBOSE:
+        print(f"[{response.status_code}] {len(response.content)}B")
+    elif response.status_code == 200:
+        dumped = json.dumps(response.json(), indent=2)
+        print(dumped if show_full or len(dumped) <= 500 else dumped[:500] + "...")
     else:
         print(f"❌ Error {response.status_code}: {response.text}")
 
+def ask(question):
+    """POST one question; returns the response, or the exception the request raised"""
+    try:
+        # Generous timeout: concurrent questions queue behind each other on the LLM
+        return SESSION.post(
+            f"{BASE_URL}/ask",
+            json={"question": question},
+            timeout=(CONNECT_TIMEOUT, 300)
+        )
+    except requests.exceptions.RequestException as e:
+        return e
+
+def upload(file_and_mime):
+    """POST one (path, MIME type) file to /upload; returns the response, or the exception raised"""
+    file_path, mime_type = file_and_mime
+    try:
+        with open(file_path, "rb") as f:
+            files = {"file": (os.path.basename(file_path), f, mime_type)}
+            if MultipartEncoder is not None:
+                encoder = MultipartEncoder(fields=files)
+                return SESSION.post(
+                    f"{BASE_URL}/upload",
+                    data=encoder,
+                    headers={"Content-Type": encoder.content_type},
+                    timeout=REQUEST_TIMEOUT
+                )
+            return SESSION.post(f"{BASE_URL}/upload", files=files, timeout=REQUEST_TIMEOUT)
+    except Exception as e:
+        return e
+
+def wait_for_server():
+    """Poll /health with backoff, exiting early if the API never answers"""
+    for delay in (0.25, 0.5, 1, 2, 4):
+        try:
+            if SESSION.get(f"{BASE_URL}/health", timeout=CONNECT_TIMEOUT).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(delay)
+    sys.exit("❌ Cannot connect to API server! Start it with: python main.py")
+
+wait_for_server()
+
+# TESTS 1-3 are independent read-only GETs, so fetch them together and print in order
+with ThreadPoolExecutor(max_workers=3) as executor:
+    formats_response, health_response, documents_response = executor.map(
+        lambda path: SESSION.get(f"{BASE_URL}{path}", timeout=REQUEST_TIMEOUT),
+        ["/supported-formats", "/health", "/documents"]
+    )
+
 # ==================== TEST 1: Check Supported Formats ====================
 print_section("TEST 1: Supported File Formats")
-response = requests.get(f"{BASE_URL}/supported-formats")
-print_response(response, show_full=True)
+print_response(formats_response, show_full=True)
 
 # ==================== TEST 2: System Health ====================
 print_section("TEST 2: System Health Check")
-response = requests.get(f"{BASE_URL}/health")
-print_response(response, show_full=True)
+print_response(health_response, show_full=True)
 
 # ==================== TEST 3: List Current Documents ====================
 print_section("TEST 3: Current Documents")
-response = requests.get(f"{BASE_URL}/documents")
-print_response(response, show_full=True)
+print_response(documents_response, show_full=True)
 
 # ==================== TEST 4: Upload Different File Types ====================
 print_section("TEST 4: Upload Test Files")
@@ -53,33 +124,38 @@ test_files = [
     ("documents/sample_products.csv", "text/csv"),
 ]
 
+uploads = []
 for file_path, mime_type in test_files:
     if os.path.exists(file_path):
-        print(f"\n📤 Uploading: {os.path.basename(file_path)}")
-        try:
-            with open(file_path, "rb") as f:
-                files = {"file": (os.path.basename(file_path), f, mime_type)}
-                response = requests.post(f"{BASE_URL}/upload", files=files)
-                if response.status_code == 200:
-                    print(f"  ✅ {response.json()['message']}")
-                else:
-                    print(f"  ❌ Upload failed: {response.text}")
-        except Exception as e:
-            print(f"  ⚠️  Error: {str(e)}")
+        uploads.append((file_path, mime_type))
     else:
         print(f"\n⏭️  Skipped: {file_path} (not found)")
 
+# Uploads are independent, so they go up side by side on the pooled connections;
+# each result prints as soon as it finishes so a slow file doesn't hold up the rest
+with ThreadPoolExecutor(max_workers=4) as executor:
+    futures = {executor.submit(upload, item): item[0] for item in uploads}
+    for future in as_completed(futures):
+        response = future.result()
+        print(f"\n📤 Uploaded: {os.path.basename(futures[future])}")
+        if isinstance(response, Exception):
+            print(f"  ⚠️  Error: {str(response)}")
+        elif response.status_code == 200:
+            print(f"  ✅ {response.json()['message']}")
+        else:
+            print(f"  ❌ Upload failed: {response.text}")
+
 # ==================== TEST 5: List Documents After Upload ====================
 print_section("TEST 5: Documents After Upload")
-response = requests.get(f"{BASE_URL}/documents")
-print_response(response, show_full=True)
+documents_response = SESSION.get(f"{BASE_URL}/documents", timeout=REQUEST_TIMEOUT)
+print_response(documents_response, show_full=True)
 
 # ==================== TEST 6: Initialize System ====================
 print_section("TEST 6: Initialize RAG System")
 print("⏳ This will take 2-5 minutes. Please wait...")
 print("   (Processing documents and creating embeddings)\n")
 
-response = requests.post(f"{BASE_URL}/initialize")
+response = SESSION.post(f"{BASE_URL}/initialize", timeout=(CONNECT_TIMEOUT, None))
 if response.status_code == 200:
     print("✅ System initialized successfully!")
     print_response(response, show_full=True)
@@ -90,49 +166,34 @@ else:
 # ==================== TEST 7: Ask Various Questions ====================
 print_section("TEST 7: Question Answering")
 
-questions = [
-    "What is RAG and how does it work?",
-    "Compare the different AI models available (Llama 2, Mistral, Phi)",
-    "What products are available in the electronics category and what are their prices?",
-    "What are the benefits of using local RAG systems?",
-    "Which AI model should I use if I have limited RAM?",
-    "Tell me about the technical details of RAG implementation",
-]
+questions = QUESTIONS
 
-for i, question in enumerate(questions, 1):
+# The questions are independent, so send them together and let the server work
+# through them; the wait becomes the slowest batch rather than the sum of all answers
+print(f"🤔 Asking {len(questions)} questions ({ASK_CONCURRENCY} at a time)...\n")
+with ThreadPoolExecutor(max_workers=ASK_CONCURRENCY) as executor:
+    responses = list(executor.map(ask, questions))
+
+for i, (question, response) in enumerate(zip(questions, responses), 1):
     print(f"\n{'─'*70}")
     print(f"Question {i}/{len(questions)}: {question}")
     print('─'*70)
-    print("🤔 Thinking...\n")
-    
-    try:
-        response = requests.post(
-            f"{BASE_URL}/ask",
-            json={"question": question},
-            timeout=120  # 2 minute timeout for LLM responses
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            print(f"📝 Answer:\n{result['answer']}\n")
-            print(f"📚 Sources Used: {len(result['sources'])} documents")
-            
-            # Show source previews
-            for idx, source in enumerate(result['sources'], 1):
-                preview = source['content_preview'][:100] + "..."
-                print(f"   {idx}. {preview}")
-        else:
-            print(f"❌ Error: {response.text}")
     
-    except requests.exceptions.Timeout:
+    if isinstance(response, requests.exceptions.Timeout):
         print("⏱️  Request timed out. The model might be taking longer than expected.")
-    except Exception as e:
-        print(f"❌ Error: {str(e)}")
-    
-    # Wait between questions to not overload the system
-    if i < len(questions):
-        print("\n⏳ Waiting 3 seconds before next question...")
-        time.sleep(3)
+    elif isinstance(response, Exception):
+        print(f"❌ Error: {str(response)}")
+    elif response.status_code == 200:
+        result = response.json()
+        print(f"📝 Answer:\n{result['answer']}\n")
+        print(f"📚 Sources Used: {len(result['sources'])} documents")
+        
+        # Show source previews
+        for idx, source in enumerate(result['sources'], 1):
+            preview = source['content_preview'][:100] + "..."
+            print(f"   {idx}. {preview}")
+    else:
+        print(f"❌ Error: {response.text}")
 
 # ==================== TEST 8: Performance with Different Models ====================
 print_section("TEST 8: Model Switching Test")
@@ -143,10 +204,9 @@ print("   Then restart the server and reinitialize.\n")
 # ==================== TEST 9: Document Management ====================
 print_section("TEST 9: Document Management")
 
-# List all documents
-response = requests.get(f"{BASE_URL}/documents")
-if response.status_code == 200:
-    docs = response.json()
+# List all documents; nothing has been uploaded or deleted since TEST 5, so reuse its listing
+if documents_response.status_code == 200:
+    docs = documents_response.json()
     print(f"📚 Total documents: {docs['count']}")
     print(f"💾 Total size: {docs['total_size_mb']} MB\n")
     
@@ -4,12 +4,19 @@ Demonstrates real-time answer generation
 """
 
 import requests
-import json
+from requests.adapters import HTTPAdapter
 import time
 import sys
 
+from client_helpers import StreamPrinter, iter_sse
+from sample_questions import COMPARE_QUESTION
+
 BASE_URL = "http://localhost:8000"
 
+# One keep-alive session so sequential calls reuse the same connection
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+
 def print_section(title):
     """Print formatted section header"""
     print("\n" + "="*70)
@@ -29,7 +36,7 @@ def test_streaming():
     print("-" * 70)
     
     # Make streaming request
-    response = requests.post(
+    response = SESSION.post(
         f"{BASE_URL}/ask/stream",
         json={"question": question},
         stream=True,
@@ -40,41 +47,26 @@ def test_streaming():
         print(f"❌ Error: {response.text}")
         return
     
-    full_answer = ""
+    answer_parts = []
     sources = []
     
     # Process streamed response
-    for line in response.iter_lines():
-        if line:
-            line = line.decode('utf-8')
-            
-            # Skip non-data lines
-            if not line.startswith('data: '):
-                continue
-            
-            # Parse JSON data
-            try:
-                data_str = line[6:]  # Remove 'data: ' prefix
-                chunk = json.loads(data_str)
-                
-                # Print sources when received
-                if "sources" in chunk and chunk["sources"]:
-                    sources = chunk["sources"]
-                    print(f"\n📚 Found {len(sources)} relevant sources\n")
-                
-                # Print answer chunks in real-time
-                if "answer_chunk" in chunk and chunk["answer_chunk"]:
-                    answer_chunk = chunk["answer_chunk"]
-                    full_answer += answer_chunk
-                    print(answer_chunk, end='', flush=True)
-                
-                # Check if done
-                if chunk.get("done", False):
-                    break
-                    
-            except json.JSONDecodeError as e:
-                print(f"\n⚠️  JSON decode error: {e}")
-                continue
+    printer = StreamPrinter()
+    for chunk in iter_sse(response, report_malformed=True):
+        # Print sources when received
+        if "sources" in chunk and chunk["sources"]:
+            sources = chunk["sources"]
+            printer.flush()
+            print(f"\n📚 Found {len(sources)} relevant sources\n")
+        
+        # Print answer chunks in real-time
+        if "answer_chunk" in chunk and chunk["answer_chunk"]:
+            answer_chunk = chunk["answer_chunk"]
+            answer_parts.append(answer_chunk)
+            printer.write(answer_chunk)
+    printer.flush()
+    
+    full_answer = "".join(answer_parts)
     
     print("\n" + "-" * 70)
     print(f"\n✅ Streaming complete!")
@@ -104,7 +96,7 @@ def test_multiple_questions_streaming():
         print(f"Question {i}/{len(questions)}: {question}")
         print('─'*70 + "\n")
         
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/ask/stream",
             json={"question": question},
             stream=True,
@@ -114,45 +106,34 @@ def test_multiple_questions_streaming():
         if response.status_code == 200:
             print("Answer: ", end='', flush=True)
             
-            for line in response.iter_lines():
-                if line:
-                    line = line.decode('utf-8')
-                    if line.startswith('data: '):
-                        try:
-                            data = json.loads(line[6:])
-                            if "answer_chunk" in data and data["answer_chunk"]:
-                                print(data["answer_chunk"], end='', flush=True)
-                            if data.get("done", False):
-                                break
-                        except:
-                            pass
+            printer = StreamPrinter()
+            for data in iter_sse(response, report_malformed=True):
+                if "answer_chunk" in data and data["answer_chunk"]:
+                    printer.write(data["answer_chunk"])
+            printer.flush()
             
             print("\n")
         else:
             print(f"❌ Error: {response.text}\n")
-        
-        # Small delay between questions
-        if i < len(questions):
-            time.sleep(2)
 
 def compare_streaming_vs_standard():
     """Compare response time: streaming vs standard"""
     
     print_section("⚡ PERFORMANCE COMPARISON")
     
-    question = "Explain the technical details of RAG implementation"
+    question = COMPARE_QUESTION
     
     # Test standard endpoint
     print("🔹 Testing STANDARD endpoint...")
-    start_time = time.time()
+    start_time = time.perf_counter()
     
-    response = requests.post(
+    response = SESSION.post(
         f"{BASE_URL}/ask",
         json={"question": question},
         timeout=120
     )
     
-    standard_time = time.time() - start_time
+    standard_time = time.perf_counter() - start_time
     
     if response.status_code == 200:
         result = response.json()
@@ -163,10 +144,10 @@ def compare_streaming_vs_standard():
     
     # Test streaming endpoint
     print("\n🔹 Testing STREAMING endpoint...")
-    start_time = time.time()
+    start_time = time.perf_counter()
     first_chunk_time = None
     
-    response = requests.post(
+    response = SESSION.post(
         f"{BASE_URL}/ask/stream",
         json={"question": question},
         stream=True,
@@ -174,34 +155,36 @@ def compare_streaming_vs_standard():
     )
     
     answer_length = 0
+    cache_hit = False
     
     if response.status_code == 200:
-        for line in response.iter_lines():
-            if line:
-                line = line.decode('utf-8')
-                if line.startswith('data: '):
-                    try:
-                        data = json.loads(line[6:])
-                        
-                        # Record time to first chunk
-                        if first_chunk_time is None and "answer_chunk" in data:
-                            first_chunk_time = time.time() - start_time
-                        
-                        # Count answer length
-                        if "answer_chunk" in data and data["answer_chunk"]:
-                            answer_length += len(data["answer_chunk"])
-                        
-                        if data.get("done", False):
-                            break
-                    except:
-                        pass
-    
-    total_stream_time = time.time() - start_time
+        for data in iter_sse(response, report_malformed=True):
+            # Record time to first chunk
+            if first_chunk_time is None and "answer_chunk" in data:
+                first_chunk_time = time.perf_counter() - start_time
+            
+            cache_hit = cache_hit or data.get("cache_hit", False)
+            
+            # Count answer length
+            if "answer_chunk" in data and data["answer_chunk"]:
+                answer_length += len(data["answer_chunk"])
+    
+    total_stream_time = time.perf_counter() - start_time
     
     print(f"   ✅ Streaming complete in {total_stream_time:.2f} seconds")
+    if first_chunk_time is None:
+        print("   ⚠️  No answer chunks received; skipping the comparison")
+        return
     print(f"   ⚡ First chunk received in {first_chunk_time:.2f} seconds")
     print(f"   📏 Answer length: {answer_length} characters")
     
+    # With SEMANTIC_CACHE=1 the server can replay the answer /ask just generated,
+    # which would time the cache rather than streaming
+    if cache_hit:
+        print("\n⚠️  Streamed answer was served from the server's answer cache; skipping the comparison")
+        print("   (restart the server without SEMANTIC_CACHE=1 to compare the endpoints)")
+        return
+    
     # Comparison
     print("\n" + "─"*70)
     print("📊 COMPARISON RESULTS:")
@@ -218,33 +201,37 @@ def main():
     print("  Testing real-time answer generation")
     print("="*70)
     
-    # Check if system is ready
-    try:
-        response = requests.get(f"{BASE_URL}/health")
-        if response.status_code == 200:
-            health = response.json()
-            if not health["system_ready"]:
-                print("\n❌ System not initialized!")
-                print("   Please run: POST /initialize first")
-                return
-        else:
-            print("\n❌ Cannot connect to API server!")
-            print("   Please make sure the server is running on http://localhost:8000")
-            return
-    except requests.exceptions.ConnectionError:
+    # Check if system is ready, retrying briefly with backoff in case the server is starting
+    response = None
+    for delay in (0.25, 0.5, 1, 2, 4):
+        try:
+            response = SESSION.get(f"{BASE_URL}/health", timeout=2)
+            break
+        except requests.exceptions.RequestException:
+            time.sleep(delay)
+    
+    if response is None:
         print("\n❌ Cannot connect to API server!")
         print("   Please start the server: python main.py")
         return
+    if response.status_code == 200:
+        health = response.json()
+        if not health["system_ready"]:
+            print("\n❌ System not initialized!")
+            print("   Please run: POST /initialize first")
+            return
+    else:
+        print("\n❌ Cannot connect to API server!")
+        print("   Please make sure the server is running on http://localhost:8000")
+        return
     
     # Run tests
     try:
         # Test 1: Basic streaming
         test_streaming()
-        time.sleep(2)
         
         # Test 2: Multiple questions
         test_multiple_questions_streaming()
-        time.sleep(2)
         
         # Test 3: Performance comparison
         compare_streaming_vs_standard()